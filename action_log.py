@@ -0,0 +1,268 @@
+import json
+import os
+import struct
+import tempfile
+import threading
+import weakref
+from array import array
+
+
+# Spill file records, little-endian, appended in the order entries were logged:
+#   b'T' code:uint16 length:uint8 name          interned action type
+#   b'A' code:uint16 timestamp:f64 settle:f64 length:uint32 details   action
+#   b'H' x:int32 y:int32 intensity:f64 duration:f64                    heatmap point
+TYPE_RECORD = struct.Struct('<cHB')
+ACTION_RECORD = struct.Struct('<cHddI')
+HEATMAP_RECORD = struct.Struct('<ciidd')
+
+_spill_counter = iter(range(1, 1 << 62))
+_spill_counter_lock = threading.Lock()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ActionLog:
+    """Append-only, compact log of a simulation's actions and heatmap points.
+
+    Action types are interned to small codes and timestamps and coordinates are kept in typed
+    arrays. Only the newest `buffer_size` entries stay in memory; older ones are spilled to an
+    append-only file, so a long run holds a bounded buffer regardless of its length. `actions`
+    and `heatmap` are read-only list-like views that yield the usual dicts on iteration.
+    """
+
+    def __init__(self, buffer_size=256, spill_dir=None):
+        self.buffer_size = buffer_size
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+        self.spill_path = None
+        self._spill_file = None
+
+        self._type_names = []
+        self._type_codes = {}
+        self._spilled_types = 0
+
+        # Buffered (not yet spilled) entries; `_order` is 0 for an action and 1 for a heatmap point
+        self._order = array('b')
+        self._action_types = array('H')
+        self._action_times = array('d')
+        self._action_settle = array('d')
+        self._action_details = []
+        self._heat_xy = array('i')
+        self._heat_values = array('d')
+
+        self.action_count = 0
+        self.heatmap_count = 0
+        self.first_timestamp = None
+
+        self.actions = _ActionView(self)
+        self.heatmap = _HeatmapView(self)
+
+    def append_action(self, action_type, details, timestamp, settle_time=0.0):
+        code = self._type_codes.get(action_type)
+        if code is None:
+            code = self._type_codes[action_type] = len(self._type_names)
+            self._type_names.append(action_type)
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+
+        self._order.append(0)
+        self._action_types.append(code)
+        self._action_times.append(timestamp)
+        self._action_settle.append(settle_time)
+        self._action_details.append(details)
+        self.action_count += 1
+        self._maybe_spill()
+
+    def append_heatmap(self, x, y, intensity, duration):
+        self._order.append(1)
+        self._heat_xy.extend((int(x), int(y)))
+        self._heat_values.extend((intensity, duration))
+        self.heatmap_count += 1
+        self._maybe_spill()
+
+    def action_dict(self, code, details, timestamp, settle_time):
+        action = {
+            'type': self._type_names[code],
+            'details': details,
+            'timestamp': timestamp,
+            'relative_time': timestamp - self.first_timestamp
+        }
+        if settle_time:
+            action['settle_time'] = round(settle_time, 3)
+        return action
+
+    def iter_actions(self):
+        for kind, entry in self._iter_entries():
+            if kind == 0:
+                yield self.action_dict(*entry)
+
+    def iter_heatmap(self):
+        for kind, (x, y, intensity, duration) in self._iter_entries():
+            if kind == 1:
+                yield {'x': x, 'y': y, 'intensity': intensity, 'duration': duration}
+
+    def close(self):
+        """Drop the spill file; the log is unusable afterwards"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+            self._finalizer()
+
+    def _maybe_spill(self):
+        if len(self._order) >= self.buffer_size:
+            self._spill()
+
+    def _spill(self):
+        if self._spill_file is None:
+            with _spill_counter_lock:
+                sequence = next(_spill_counter)
+            self.spill_path = os.path.join(self.spill_dir, f'actions-{os.getpid()}-{sequence}.log')
+            self._spill_file = open(self.spill_path, 'ab')
+            self._finalizer = weakref.finalize(self, _remove, self.spill_path)
+
+        chunks = []
+        for code in range(self._spilled_types, len(self._type_names)):
+            name = self._type_names[code].encode('utf-8')[:255]
+            chunks.append(TYPE_RECORD.pack(b'T', code, len(name)) + name)
+        self._spilled_types = len(self._type_names)
+
+        action_index = heat_index = 0
+        for kind in self._order:
+            if kind == 0:
+                details = str(self._action_details[action_index]).encode('utf-8')
+                chunks.append(ACTION_RECORD.pack(
+                    b'A', self._action_types[action_index], self._action_times[action_index],
+                    self._action_settle[action_index], len(details)
+                ) + details)
+                action_index += 1
+            else:
+                chunks.append(HEATMAP_RECORD.pack(
+                    b'H', self._heat_xy[2 * heat_index], self._heat_xy[2 * heat_index + 1],
+                    self._heat_values[2 * heat_index], self._heat_values[2 * heat_index + 1]
+                ))
+                heat_index += 1
+        self._spill_file.write(b''.join(chunks))
+        self._spill_file.flush()
+
+        for buffer in (self._order, self._action_types, self._action_times, self._action_settle,
+                       self._heat_xy, self._heat_values):
+            del buffer[:]
+        self._action_details = []
+
+    def _iter_entries(self):
+        """Yield (0, (code, details, timestamp, settle)) and (1, (x, y, intensity, duration)) in log order"""
+        if self.spill_path is not None:
+            with open(self.spill_path, 'rb') as f:
+                read = f.read
+                while True:
+                    kind = read(1)
+                    if not kind:
+                        break
+                    if kind == b'A':
+                        _, code, timestamp, settle, length = ACTION_RECORD.unpack(kind + read(ACTION_RECORD.size - 1))
+                        yield 0, (code, read(length).decode('utf-8'), timestamp, settle)
+                    elif kind == b'H':
+                        yield 1, HEATMAP_RECORD.unpack(kind + read(HEATMAP_RECORD.size - 1))[1:]
+                    else:
+                        _, _, length = TYPE_RECORD.unpack(kind + read(TYPE_RECORD.size - 1))
+                        read(length)  # Type names are also held in memory
+
+        action_index = heat_index = 0
+        for kind in list(self._order):
+            if kind == 0:
+                yield 0, (self._action_types[action_index], self._action_details[action_index],
+                          self._action_times[action_index], self._action_settle[action_index])
+                action_index += 1
+            else:
+                yield 1, (self._heat_xy[2 * heat_index], self._heat_xy[2 * heat_index + 1],
+                          self._heat_values[2 * heat_index], self._heat_values[2 * heat_index + 1])
+                heat_index += 1
+
+
+class _ActionView:
+    """Read-only list-like view of the log's actions"""
+
+    def __init__(self, log):
+        self._log = log
+
+    def __len__(self):
+        return self._log.action_count
+
+    def __iter__(self):
+        return self._log.iter_actions()
+
+    def __getitem__(self, index):
+        """Positional access reads through the log; prefer iteration"""
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('action index out of range')
+        for position, action in enumerate(self):
+            if position == index:
+                return action
+
+    def close(self):
+        """Close the underlying log (and drop its spill file)"""
+        self._log.close()
+
+
+class _HeatmapView:
+    """Read-only list-like view of the log's heatmap points"""
+
+    def __init__(self, log):
+        self._log = log
+
+    def __len__(self):
+        return self._log.heatmap_count
+
+    def __iter__(self):
+        return self._log.iter_heatmap()
+
+    def close(self):
+        """Close the underlying log (and drop its spill file)"""
+        self._log.close()
+
+
+def close_results(results):
+    """Close the action logs behind a results dict's views, once the results are persisted.
+
+    The log and its views reference each other, so without this the spill file and its
+    descriptor would only go away when the cyclic garbage collector runs.
+    """
+    for key in ('actions', 'heatmap_data'):
+        value = results.get(key)
+        if isinstance(value, (_ActionView, _HeatmapView)):
+            value.close()
+
+
+def iter_results_json(results, chunk_size=1 << 16):
+    """Encode simulation results as JSON chunks, streaming action-log views instead of building one string"""
+    lazy = {key: value for key, value in results.items() if isinstance(value, (_ActionView, _HeatmapView))}
+    head = json.dumps({key: value for key, value in results.items() if key not in lazy})
+    if not lazy:
+        yield head
+        return
+
+    parts = [head[:-1]]
+    size = len(parts[0])
+    separator = ', ' if len(head) > 2 else ''
+    for key, view in lazy.items():
+        parts.append(f'{separator}{json.dumps(key)}: [')
+        separator = ', '
+        item_separator = ''
+        for item in view:
+            encoded = item_separator + json.dumps(item)
+            item_separator = ', '
+            parts.append(encoded)
+            size += len(encoded)
+            if size >= chunk_size:
+                yield ''.join(parts)
+                parts, size = [], 0
+        parts.append(']')
+    parts.append('}')
+    yield ''.join(parts)
@@ -1,198 +1,252 @@
 import json
+import sqlite3
+import tempfile
+from array import array
 import numpy as np
 from simulation import SimulationManager
 from persona import PersonaManager
+from metrics import REGISTRY, timed_db_operation
+from database import get_database
+from heatmap import heatmap_arrays, cluster_heatmap_grid
+
+ANALYTICS_SECONDS = REGISTRY.histogram('simulator_analytics_generation_seconds', 'Time to generate analytics for one simulation')
+COHORT_ANALYTICS_SECONDS = REGISTRY.histogram('simulator_cohort_analytics_seconds', 'Time to compute analytics across a cohort of simulations')
+
+# Bump whenever the analytics output changes; older materialized records are recomputed on read
+ANALYTICS_VERSION = 3
+
+JOURNEY_STAGES = {
+    'page_load': 'discovery', 'page_scan': 'discovery',
+    'element_chosen': 'exploration', 'confusion_click': 'exploration',
+    'click': 'interaction', 'input': 'interaction', 'select': 'interaction'
+}
+MEANINGFUL_ACTIONS = ('click', 'input', 'select')
+HELP_WORDS = ('help', 'support', 'faq')
+COHORT_FILTERS = ('url', 'persona_id', 'device_type', 'goal', 'since', 'until')
+COHORT_PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+CONFIDENCE_Z = 1.959964  # 95% two-sided
 
 class AnalyticsEngine:
-    def __init__(self):
-        self.simulation_manager = SimulationManager()
-        self.persona_manager = PersonaManager()
+    def __init__(self, db_path='simulator.db'):
+        self.db_path = db_path
+        self.db = get_database(db_path)
+        self.simulation_manager = SimulationManager(db_path)
+        self.persona_manager = PersonaManager(db_path)
+    
+    @timed_db_operation
+    def init_db(self):
+        """Initialize the materialized analytics table"""
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS simulation_analytics (
+                simulation_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                analytics TEXT NOT NULL,  -- JSON string
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
     
     def generate_analytics(self, simulation_id):
-        """Generate comprehensive analytics for a simulation"""
+        """Get analytics for a simulation, from its materialized record when current"""
+        materialized = self.get_materialized_json(simulation_id)
+        if materialized is not None:
+            return json.loads(materialized)
+        
         simulation = self.simulation_manager.get_simulation(simulation_id)
         if not simulation or not simulation['results']:
             return {'error': 'Simulation not found or incomplete'}
         
-        results = simulation['results']
+        # Completed results never change, so their analytics are computed once and kept
+        if simulation['status'] == 'completed':
+            return self.materialize(simulation_id, simulation['results'])
+        return self.compute_analytics(simulation_id, simulation['results'])
+    
+    def materialize(self, simulation_id, results):
+        """Compute analytics for completed results and store them as the materialized record"""
+        analytics = self.compute_analytics(simulation_id, results)
+        self._store(simulation_id, analytics)
+        return analytics
+    
+    @timed_db_operation
+    def get_materialized_json(self, simulation_id):
+        """Stored analytics JSON if it was produced by the current ANALYTICS_VERSION, else None"""
+        try:
+            row = self.db.query_one('''
+                SELECT analytics FROM simulation_analytics WHERE simulation_id = ? AND version = ?
+            ''', (simulation_id, ANALYTICS_VERSION))
+        except sqlite3.OperationalError:
+            # Table not created yet; analytics are computed on the fly
+            row = None
+        
+        return row[0] if row else None
+    
+    @timed_db_operation
+    def _store(self, simulation_id, analytics):
+        """Encode the analytics in chunks and write them through incremental blob I/O"""
+        with tempfile.SpooledTemporaryFile(max_size=1 << 20) as encoded:
+            for chunk in json.JSONEncoder().iterencode(analytics):
+                encoded.write(chunk.encode('utf-8'))
+            size = encoded.tell()
+            encoded.seek(0)
+            
+            with self.db.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT OR REPLACE INTO simulation_analytics (simulation_id, version, analytics)
+                    VALUES (?, ?, zeroblob(?))
+                ''', (simulation_id, ANALYTICS_VERSION, size))
+                with conn.blobopen('simulation_analytics', 'analytics', cursor.lastrowid) as blob:
+                    while chunk := encoded.read(1 << 16):
+                        blob.write(chunk)
+    
+    @ANALYTICS_SECONDS.time()
+    def compute_analytics(self, simulation_id, results):
+        """Compute every analytics section with a single traversal of the actions"""
+        scan = self._scan_actions(results.get('actions', []))
+        friction_points = self._identify_friction_points(results, scan)
         
-        analytics = {
+        return {
             'simulation_id': simulation_id,
-            'overview': self._generate_overview(results),
-            'user_journey': self._analyze_user_journey(results),
+            'overview': self._generate_overview(results, scan),
+            'user_journey': self._analyze_user_journey(scan),
             'heatmap': self._process_heatmap_data(results),
-            'performance_metrics': self._calculate_performance_metrics(results),
-            'friction_points': self._identify_friction_points(results),
-            'recommendations': self._generate_recommendations(results),
-            'persona_insights': self._analyze_persona_behavior(results)
+            'performance_metrics': self._calculate_performance_metrics(results, scan),
+            'friction_points': friction_points,
+            'recommendations': self._generate_recommendations(results, friction_points),
+            'persona_insights': self._analyze_persona_behavior(results, scan)
         }
+    
+    def _scan_actions(self, actions):
+        """Walk the actions once, collecting what every section needs.
+
+        Each action becomes one flow step, which its stage lists by reference, so a streamed
+        action log is never held in memory twice.
+        """
+        stages = {'discovery': [], 'exploration': [], 'interaction': [], 'completion': []}
+        flow = []
+        action_times = array('d')  # relative_time of every action after the first
+        long_delays = []
+        meaningful = 0
+        mentions_price = mentions_help = False
+        previous_time = None
         
-        return analytics
+        for i, action in enumerate(actions):
+            action_type = action['type']
+            details = action.get('details', '')
+            relative_time = action.get('relative_time', 0)
+            stage = JOURNEY_STAGES.get(action_type, 'completion')
+            
+            step = {
+                'step': i + 1,
+                'action_type': action_type,
+                'details': details,
+                'time': relative_time,
+                'stage': stage
+            }
+            flow.append(step)
+            stages[stage].append(step)
+            
+            if action_type in MEANINGFUL_ACTIONS:
+                meaningful += 1
+            lower_details = details.lower()
+            mentions_price = mentions_price or 'price' in lower_details
+            mentions_help = mentions_help or any(word in lower_details for word in HELP_WORDS)
+            
+            if previous_time is not None:
+                action_times.append(relative_time)
+                time_gap = relative_time - previous_time
+                if time_gap > 5:  # More than 5 seconds
+                    long_delays.append((time_gap, action.get('timestamp', 0)))
+            previous_time = relative_time
+        
+        return {
+            'count': len(flow),
+            'stages': stages,
+            'flow': flow,
+            'action_times': action_times,
+            'avg_action_time': float(np.mean(action_times)) if action_times else 0,
+            'long_delays': long_delays,
+            'meaningful': meaningful,
+            'mentions_price': mentions_price,
+            'mentions_help': mentions_help
+        }
     
-    def _generate_overview(self, results):
+    def _generate_overview(self, results, scan):
         """Generate high-level overview metrics"""
-        actions = results.get('actions', [])
         analytics = results.get('analytics', {})
         
         return {
             'success': results.get('success', False),
             'completion_time': round(analytics.get('completion_time', 0), 2),
-            'total_actions': len(actions),
+            'total_actions': scan['count'],
             'time_to_first_interaction': round(analytics.get('time_to_first_interaction', 0), 2),
             'bounce_points': len(analytics.get('bounce_points', [])),
             'confusion_clicks': len(analytics.get('confusion_clicks', [])),
             'success_rate': analytics.get('success_rate', 0) * 100
         }
     
-    def _analyze_user_journey(self, results):
+    def _analyze_user_journey(self, scan):
         """Analyze the user's journey through the interface"""
-        actions = results.get('actions', [])
-        
-        if not actions:
+        if not scan['count']:
             return {'stages': [], 'flow': []}
         
-        # Categorize actions into journey stages
-        stages = {
-            'discovery': [],
-            'exploration': [],
-            'interaction': [],
-            'completion': []
-        }
-        
-        journey_flow = []
-        
-        for i, action in enumerate(actions):
-            action_type = action['type']
-            timestamp = action['timestamp']
-            relative_time = action.get('relative_time', 0)
-            
-            # Categorize action
-            if action_type in ['page_load', 'page_scan']:
-                stage = 'discovery'
-            elif action_type in ['element_chosen', 'confusion_click']:
-                stage = 'exploration'
-            elif action_type in ['click', 'input', 'select']:
-                stage = 'interaction'
-            else:
-                stage = 'completion'
-            
-            stages[stage].append({
-                'action': action,
-                'sequence': i + 1,
-                'time': relative_time
-            })
-            
-            journey_flow.append({
-                'step': i + 1,
-                'action_type': action_type,
-                'details': action.get('details', ''),
-                'time': relative_time,
-                'stage': stage
-            })
-        
         return {
-            'stages': stages,
-            'flow': journey_flow,
-            'stage_distribution': {stage: len(actions) for stage, actions in stages.items()}
+            'stages': scan['stages'],
+            'flow': scan['flow'],
+            'stage_distribution': {stage: len(actions) for stage, actions in scan['stages'].items()}
         }
     
     def _process_heatmap_data(self, results):
-        """Process and enhance heatmap data"""
+        """Summarize heatmap data as zones and statistics.
+
+        Raw points are not repeated here; they are in simulation_heatmap_points, and the page
+        draws the stored density grid (heatmap.png).
+        """
         heatmap_data = results.get('heatmap_data', [])
         
-        if not heatmap_data:
-            return {'points': [], 'zones': []}
+        if not len(heatmap_data):
+            return {'zones': []}
         
-        # Group nearby points into zones
-        zones = self._cluster_heatmap_points(heatmap_data)
+        x, y, intensities = heatmap_arrays(heatmap_data)
         
-        # Calculate intensity statistics
-        intensities = [point['intensity'] for point in heatmap_data]
+        # Group nearby points into zones
+        zones = self._cluster_heatmap_points(x, y, intensities)
         
         return {
-            'points': heatmap_data,
             'zones': zones,
             'statistics': {
-                'total_points': len(heatmap_data),
-                'avg_intensity': np.mean(intensities) if intensities else 0,
-                'max_intensity': max(intensities) if intensities else 0,
-                'hotspot_count': sum(1 for i in intensities if i > 0.7)
+                'total_points': len(x),
+                'avg_intensity': float(intensities.mean()),
+                'max_intensity': float(intensities.max()),
+                'hotspot_count': int(np.count_nonzero(intensities > 0.7))
             }
         }
     
-    def _cluster_heatmap_points(self, points):
-        """Cluster nearby heatmap points into zones"""
-        zones = []
-        if len(points) < 2:
-            return zones
-        
-        # Simple clustering based on proximity
-        cluster_distance = 100  # pixels
-        processed = set()
-        
-        for i, point in enumerate(points):
-            if i in processed:
-                continue
-            
-            cluster = [point]
-            processed.add(i)
-            
-            for j, other_point in enumerate(points[i+1:], i+1):
-                if j in processed:
-                    continue
-                
-                distance = np.sqrt(
-                    (point['x'] - other_point['x'])**2 + 
-                    (point['y'] - other_point['y'])**2
-                )
-                
-                if distance <= cluster_distance:
-                    cluster.append(other_point)
-                    processed.add(j)
-            
-            if len(cluster) > 1:
-                # Calculate zone center and intensity
-                center_x = np.mean([p['x'] for p in cluster])
-                center_y = np.mean([p['y'] for p in cluster])
-                total_intensity = sum([p['intensity'] for p in cluster])
-                
-                zones.append({
-                    'center': {'x': center_x, 'y': center_y},
-                    'points': len(cluster),
-                    'intensity': total_intensity / len(cluster),
-                    'hotness': 'high' if total_intensity / len(cluster) > 0.7 else 'medium'
-                })
-        
-        return zones
+    def _cluster_heatmap_points(self, x, y, intensities):
+        """Cluster nearby heatmap points into zones (100px grid cells)"""
+        return cluster_heatmap_grid(x, y, intensities, cell_size=100)
     
-    def _calculate_performance_metrics(self, results):
+    def _calculate_performance_metrics(self, results, scan):
         """Calculate detailed performance metrics"""
-        actions = results.get('actions', [])
         analytics = results.get('analytics', {})
+        total_actions = scan['count']
         
-        if not actions:
+        if not total_actions:
             return {}
         
-        # Calculate action timing metrics
-        action_times = [action.get('relative_time', 0) for action in actions[1:]]  # Skip first action
-        
-        # Calculate interaction efficiency
-        meaningful_actions = [a for a in actions if a['type'] in ['click', 'input', 'select']]
-        total_actions = len(actions)
+        # Action timing metrics skip the first action
+        action_times = scan['action_times']
         
         metrics = {
-            'efficiency_score': (len(meaningful_actions) / total_actions * 100) if total_actions > 0 else 0,
-            'average_action_time': np.mean(action_times) if action_times else 0,
-            'action_consistency': np.std(action_times) if len(action_times) > 1 else 0,
+            'efficiency_score': scan['meaningful'] / total_actions * 100,
+            'average_action_time': scan['avg_action_time'],
+            'action_consistency': float(np.std(action_times)) if len(action_times) > 1 else 0,
             'completion_rate': 100 if results.get('success') else 0,
-            'error_rate': (len(analytics.get('confusion_clicks', [])) / total_actions * 100) if total_actions > 0 else 0
+            'error_rate': len(analytics.get('confusion_clicks', [])) / total_actions * 100
         }
         
         return metrics
     
-    def _identify_friction_points(self, results):
+    def _identify_friction_points(self, results, scan):
         """Identify specific friction points in the user journey"""
-        actions = results.get('actions', [])
         analytics = results.get('analytics', {})
         
         friction_points = []
@@ -217,17 +271,15 @@ class AnalyticsEngine:
                 'impact': 'Task abandonment, potential user loss'
             })
         
-        # Analyze long delays between actions
-        for i in range(1, len(actions)):
-            time_gap = actions[i].get('relative_time', 0) - actions[i-1].get('relative_time', 0)
-            if time_gap > 5:  # More than 5 seconds
-                friction_points.append({
-                    'type': 'long_delay',
-                    'severity': 'medium',
-                    'description': f"Long delay ({time_gap:.1f}s) between actions",
-                    'timestamp': actions[i].get('timestamp', 0),
-                    'impact': 'Possible confusion or complex interface'
-                })
+        # Long delays between actions, found during the action scan
+        for time_gap, timestamp in scan['long_delays']:
+            friction_points.append({
+                'type': 'long_delay',
+                'severity': 'medium',
+                'description': f"Long delay ({time_gap:.1f}s) between actions",
+                'timestamp': timestamp,
+                'impact': 'Possible confusion or complex interface'
+            })
         
         # Sort by severity and timestamp
         severity_order = {'critical': 3, 'high': 2, 'medium': 1, 'low': 0}
@@ -235,12 +287,10 @@ class AnalyticsEngine:
         
         return friction_points
     
-    def _generate_recommendations(self, results):
+    def _generate_recommendations(self, results, friction_points):
         """Generate actionable recommendations based on analysis"""
         recommendations = []
         
-        friction_points = self._identify_friction_points(results)
-        actions = results.get('actions', [])
         persona = results.get('persona', {})
         
         # Recommendation based on friction points
@@ -287,10 +337,9 @@ class AnalyticsEngine:
         
         return recommendations
     
-    def _analyze_persona_behavior(self, results):
+    def _analyze_persona_behavior(self, results, scan):
         """Analyze behavior patterns specific to the persona"""
         persona = results.get('persona', {})
-        actions = results.get('actions', [])
         
         insights = {
             'persona_name': persona.get('name', 'Unknown'),
@@ -300,21 +349,16 @@ class AnalyticsEngine:
         }
         
         traits = persona.get('traits', [])
+        avg_time = scan['avg_action_time']
         
         # Analyze behavior patterns
         if 'impatient' in traits:
-            action_times = [a.get('relative_time', 0) for a in actions[1:]]
-            avg_time = np.mean(action_times) if action_times else 0
-            
             if avg_time < 2:
                 insights['behavior_patterns'].append('Confirmed impatient behavior - quick actions')
             else:
                 insights['deviations'].append('Expected faster actions for impatient persona')
         
         if 'careful' in traits:
-            action_times = [a.get('relative_time', 0) for a in actions[1:]]
-            avg_time = np.mean(action_times) if action_times else 0
-            
             if avg_time > 3:
                 insights['behavior_patterns'].append('Confirmed careful behavior - deliberate actions')
             else:
@@ -323,14 +367,99 @@ class AnalyticsEngine:
         # Analyze trait manifestations
         for trait in traits:
             if trait == 'price-conscious':
-                price_actions = [a for a in actions if 'price' in a.get('details', '').lower()]
-                if price_actions:
+                if scan['mentions_price']:
                     insights['trait_manifestations'].append(f'Price-conscious behavior: focused on pricing elements')
             
             elif trait == 'help-seeking':
-                help_actions = [a for a in actions if any(word in a.get('details', '').lower() 
-                                                         for word in ['help', 'support', 'faq'])]
-                if help_actions:
+                if scan['mentions_help']:
                     insights['trait_manifestations'].append(f'Help-seeking behavior: looked for assistance')
         
         return insights
+    
+    @COHORT_ANALYTICS_SECONDS.time()
+    def cohort_analytics(self, url=None, persona_id=None, device_type=None, goal=None, since=None, until=None,
+                         bins=20, top_reasons=10):
+        """Aggregate analytics across every completed simulation matching the filters.
+
+        Reads the normalized per-simulation metrics as columns and reduces them with NumPy, so
+        the cost is one indexed scan however many simulations match. Dates compare against
+        completed_at and `until` is exclusive.
+        """
+        filters = [('m.url = ?', url), ('m.persona_id = ?', persona_id), ('m.device_type = ?', device_type),
+                   ('m.goal = ?', goal), ('m.completed_at >= ?', since), ('m.completed_at < ?', until)]
+        clauses = [clause for clause, value in filters if value is not None]
+        where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        params = [value for _, value in filters if value is not None]
+        
+        rows = self.db.query(f'''
+            SELECT m.success, m.completion_time, m.time_to_first_interaction, m.confusion_clicks, m.bounce_points
+            FROM simulation_metrics m {where}
+        ''', params)
+        # None becomes NaN in a float array
+        columns = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        success, completion_time, first_interaction, confusion_clicks, bounce_points = columns.T
+        count = len(columns)
+        
+        # Reasons are normalized when recorded; older rows are cut to their first line so traces don't split groups
+        bounce_reasons = self.db.query(f'''
+            SELECT rtrim(substr(f.reason, 1, instr(f.reason || char(10), char(10)) - 1)) AS reason,
+                   COUNT(*) AS occurrences
+            FROM simulation_friction f JOIN simulation_metrics m ON m.simulation_id = f.simulation_id
+            {where + ' AND' if where else 'WHERE'} f.kind = 'bounce'
+            GROUP BY 1 ORDER BY occurrences DESC, reason LIMIT ?
+        ''', params + [top_reasons])
+        
+        successes = int(success.sum())
+        low, high = wilson_interval(successes, count)
+        return {
+            'filters': {key: value for key, value in zip(COHORT_FILTERS, (url, persona_id, device_type, goal, since, until))
+                        if value is not None},
+            'simulations': count,
+            'success': {
+                'successes': successes,
+                'rate': round(successes / count * 100, 2) if count else None,
+                'confidence_interval': [round(low * 100, 2), round(high * 100, 2)] if count else None,
+                'confidence_level': 0.95
+            },
+            'completion_time': distribution(completion_time, bins),
+            # Zero means the run never reached a click, input or select
+            'time_to_first_interaction': distribution(first_interaction[first_interaction > 0], bins),
+            'friction': {
+                kind: {
+                    'total': int(np.nansum(counts)),
+                    'per_simulation': round(float(np.nanmean(counts)), 3) if count else None,
+                    'simulations_affected': int(np.count_nonzero(counts > 0))
+                }
+                for kind, counts in (('confusion_click', confusion_clicks), ('bounce', bounce_points))
+            },
+            'top_bounce_reasons': [{'reason': reason, 'count': occurrences} for reason, occurrences in bounce_reasons]
+        }
+
+
+def wilson_interval(successes, total, z=CONFIDENCE_Z):
+    """Wilson score interval for a binomial proportion; stays inside [0, 1] for small or extreme cohorts"""
+    if not total:
+        return 0.0, 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def distribution(values, bins=20):
+    """Summary statistics, percentiles and a histogram of a 1-D array, ignoring NaNs"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0}
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        'count': int(len(values)),
+        'mean': round(float(values.mean()), 4),
+        'std': round(float(values.std()), 4),
+        'min': round(float(values.min()), 4),
+        'max': round(float(values.max()), 4),
+        'percentiles': {f'p{q}': round(float(v), 4)
+                        for q, v in zip(COHORT_PERCENTILES, np.percentile(values, COHORT_PERCENTILES))},
+        'histogram': {'edges': np.round(edges, 4).tolist(), 'counts': counts.tolist()}
+    }
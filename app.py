@@ -1,14 +1,25 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g, Response
 from flask_cors import CORS
 import sqlite3
 import json
 import uuid
 from datetime import datetime
 import os
+import time
 from behavior_engine import BehaviorSimulator
-from analytics import AnalyticsEngine
+from analytics import AnalyticsEngine, COHORT_FILTERS
 from persona import PersonaManager
 from simulation import SimulationManager
+from executor import SimulationExecutor
+from job_queue import SimulationQueue
+from batch import BatchManager
+from tracing import aggregate_spans
+from metrics import REGISTRY
+from network import resolve_network_profile
+from database import release_connections
+from events import SimulationEventBus, format_sse, replay_events
+from heatmap import GRID_ROWS_PER_SCREEN, GRID_SCREENS, MAX_IMAGE_SIDE, HeatmapImageCache, render_heatmap_png
+import numpy as np
 
 app = Flask(__name__)
 app.secret_key = 'user_behavior_simulator_secret_key'
@@ -17,8 +28,56 @@ CORS(app)
 # Initialize components
 persona_manager = PersonaManager()
 simulation_manager = SimulationManager()
-behavior_simulator = BehaviorSimulator()
+event_bus = SimulationEventBus()
+behavior_simulator = BehaviorSimulator(event_bus=event_bus)
 analytics_engine = AnalyticsEngine()
+heatmap_images = HeatmapImageCache(max_entries=int(os.environ.get('HEATMAP_IMAGE_CACHE_SIZE', 128)))
+
+# 'thread' runs simulations in this process; 'queue' only enqueues for worker.py processes
+if os.environ.get('SIMULATION_EXECUTOR', 'thread') == 'queue':
+    simulation_executor = SimulationQueue()
+else:
+    simulation_executor = SimulationExecutor(
+        behavior_simulator, simulation_manager,
+        max_workers=int(os.environ.get('SIMULATION_WORKERS', 2)),
+        analytics_engine=analytics_engine
+    )
+batch_manager = BatchManager(simulation_manager, simulation_executor)
+
+# Process-wide metrics exposed at /metrics
+REQUEST_SECONDS = REGISTRY.histogram('simulator_http_request_seconds', 'API request latency by route, method and status')
+REGISTRY.gauge('simulator_queue_depth', 'Simulations waiting for or being run by a worker').set_function(
+    simulation_executor.queue_depth
+)
+REGISTRY.gauge('simulator_active_browsers', 'Pooled browser sessions in use, by device profile').set_function(
+    lambda: {(('device_type', device),): stats['in_use']
+             for device, stats in behavior_simulator.browser_pool.stats().items()}
+)
+REGISTRY.gauge('simulator_live_browsers', 'Launched browser sessions, by device profile').set_function(
+    lambda: {(('device_type', device),): stats['live']
+             for device, stats in behavior_simulator.browser_pool.stats().items()}
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+@app.teardown_request
+def release_database_connections(exc):
+    # Werkzeug's dev server runs each request on a fresh thread; keep its connections for the next one
+    release_connections()
 
 @app.route('/')
 def index():
@@ -39,7 +98,8 @@ def manage_personas():
             description=data['description'],
             traits=data['traits'],
             tech_savviness=data['tech_savviness'],
-            intent=data['intent']
+            intent=data['intent'],
+            scoring_rules=data.get('scoring_rules')
         )
         return jsonify({'persona_id': persona_id, 'status': 'created'})
 
@@ -61,7 +121,7 @@ def handle_persona(persona_id):
 
 @app.route('/api/simulations', methods=['POST'])
 def create_simulation():
-    """Create and run a new behavior simulation"""
+    """Create a new behavior simulation and queue it for background execution"""
     data = request.get_json()
     
     simulation_id = str(uuid.uuid4())
@@ -70,37 +130,267 @@ def create_simulation():
         'persona_id': data['persona_id'],
         'goal': data['goal'],
         'duration': data.get('duration', 300),  # 5 minutes default
-        'device_type': data.get('device_type', 'desktop')
+        'device_type': data.get('device_type', 'desktop'),
+        'time_mode': data.get('time_mode', 'real'),  # 'virtual' skips persona think time
+        'engine': data.get('engine', 'selenium'),  # 'http' skips the browser for static sites
+        'network_profile': data.get('network_profile', 'full'),  # 'lean'/'dom' block heavy resources
+        'block_urls': data.get('block_urls', [])
     }
     
-    # Store simulation config
+    try:
+        resolve_network_profile(simulation_config)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Store simulation config as 'queued' and hand it to the worker pool
     simulation_manager.create_simulation(simulation_id, simulation_config)
+    simulation_executor.submit(simulation_id, simulation_config)
     
-    # Run simulation asynchronously (in a real app, you'd use Celery or similar)
-    try:
-        results = behavior_simulator.run_simulation(simulation_id, simulation_config)
-        simulation_manager.update_simulation_results(simulation_id, results)
-        return jsonify({'simulation_id': simulation_id, 'status': 'completed', 'results': results})
-    except Exception as e:
-        return jsonify({'simulation_id': simulation_id, 'status': 'failed', 'error': str(e)}), 500
+    return jsonify({'simulation_id': simulation_id, 'status': 'queued'}), 202
 
 @app.route('/api/simulations/<simulation_id>')
 def get_simulation(simulation_id):
-    """Get simulation results"""
+    """Get simulation status and results"""
     simulation = simulation_manager.get_simulation(simulation_id)
-    return jsonify(simulation) if simulation else jsonify({'error': 'Simulation not found'}), 404
+    if not simulation:
+        return jsonify({'error': 'Simulation not found'}), 404
+    return jsonify(simulation)
+
+@app.route('/api/simulations/<simulation_id>/stream')
+def stream_simulation(simulation_id):
+    """Server-Sent Events: actions, heatmap points and friction as they happen, then 'end'.
+
+    Resume with ?offset=N or the Last-Event-ID header. Simulations run by worker processes
+    (or already finished) are replayed from their stored results once those are saved.
+    """
+    try:
+        if 'offset' in request.args:
+            offset = int(request.args['offset'])
+        elif request.headers.get('Last-Event-ID'):
+            offset = int(request.headers['Last-Event-ID']) + 1
+        else:
+            offset = 0
+    except ValueError:
+        return jsonify({'error': 'offset and Last-Event-ID must be integers'}), 400
+    if offset < 0:
+        return jsonify({'error': 'offset must not be negative'}), 400
+    
+    if not event_bus.has_stream(simulation_id) and not simulation_manager.get_simulation(simulation_id):
+        return jsonify({'error': 'Simulation not found'}), 404
+    
+    def generate():
+        position = offset
+        while True:
+            # Follow the run while this process streams it; the stream is gone once it ends
+            for event in event_bus.subscribe(simulation_id, position):
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(*event)
+                position = event[0] + 1
+                if event[1] == 'end':
+                    return
+            
+            # Otherwise wait for the run to start here, or for its outcome to be stored
+            simulation = simulation_manager.get_simulation(simulation_id)
+            if not simulation:
+                return
+            if simulation['status'] in ('completed', 'failed'):
+                events = replay_events(simulation['results'] or {'error': 'No results stored'})
+                # Resuming past the last event still ends with 'end', or EventSource would reconnect forever
+                start = min(position, len(events) - 1)
+                for event_id, (event_type, data) in enumerate(events[start:], start=start):
+                    yield format_sse(event_id, event_type, data)
+                return
+            yield ': waiting\n\n'
+            time.sleep(1)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/simulations/<simulation_id>/analytics')
 def get_simulation_analytics(simulation_id):
     """Get detailed analytics for a simulation"""
+    # Materialized records are served as stored, without parsing or re-encoding
+    materialized = analytics_engine.get_materialized_json(simulation_id)
+    if materialized is not None:
+        return Response(materialized, mimetype='application/json')
     analytics = analytics_engine.generate_analytics(simulation_id)
     return jsonify(analytics)
 
+@app.route('/api/analytics/cohort')
+def cohort_analytics():
+    """Aggregate analytics across the completed simulations matching url, persona_id, device_type, goal and since/until"""
+    bins = request.args.get('bins', 20, type=int)
+    top_reasons = request.args.get('top_reasons', 10, type=int)
+    if not 1 <= bins <= 200:
+        return jsonify({'error': 'bins must be between 1 and 200'}), 400
+    if not 1 <= top_reasons <= 100:
+        return jsonify({'error': 'top_reasons must be between 1 and 100'}), 400
+
+    filters = {key: request.args.get(key) for key in COHORT_FILTERS}
+    return jsonify(analytics_engine.cohort_analytics(bins=bins, top_reasons=top_reasons, **filters))
+
+@app.route('/api/simulations/<simulation_id>/heatmap-grid')
+def get_simulation_heatmap_grid(simulation_id):
+    """Viewport-normalized density grid stored when the simulation completed"""
+    grid = simulation_manager.get_heatmap_grid(simulation_id)
+    if grid is None:
+        return jsonify({'error': 'No heatmap grid for this simulation'}), 404
+    return jsonify(grid_payload(grid))
+
+@app.route('/api/heatmaps/aggregate')
+def aggregate_heatmaps():
+    """Sum of stored density grids for ?url=&persona_id=&device_type=&since=&until="""
+    aggregate = simulation_manager.aggregate_heatmap_grids(**heatmap_filters(request.args))
+    payload = grid_payload(aggregate['grid'])
+    payload.update(simulations=aggregate['simulations'], points=aggregate['points'])
+    return jsonify(payload)
+
+@app.route('/api/simulations/<simulation_id>/heatmap.png')
+def get_simulation_heatmap_image(simulation_id):
+    """Rendered heatmap PNG (?width=&height=&screens=&overlay=1)"""
+    grid = simulation_manager.get_heatmap_grid(simulation_id)
+    if grid is None:
+        return jsonify({'error': 'No heatmap grid for this simulation'}), 404
+    return heatmap_image_response(grid.tobytes(), lambda: grid)
+
+@app.route('/api/heatmaps/aggregate.png')
+def aggregate_heatmap_image():
+    """Rendered aggregate heatmap PNG; accepts the /api/heatmaps/aggregate filters"""
+    filters = heatmap_filters(request.args)
+    fingerprint = simulation_manager.heatmap_grids_fingerprint(**filters)
+    return heatmap_image_response(
+        json.dumps([filters, fingerprint], sort_keys=True),
+        lambda: simulation_manager.aggregate_heatmap_grids(**filters)['grid']
+    )
+
+def heatmap_image_response(source, load_grid):
+    """Serve a cached render when possible; `load_grid` is only called on a cache miss"""
+    options = {
+        'width': request.args.get('width', type=int),
+        'height': request.args.get('height', type=int),
+        'screens': request.args.get('screens', type=int),
+        'overlay': request.args.get('overlay') in ('1', 'true')
+    }
+    for name in ('width', 'height'):
+        if options[name] is not None and not 1 <= options[name] <= MAX_IMAGE_SIDE:
+            return jsonify({'error': f'{name} must be between 1 and {MAX_IMAGE_SIDE}'}), 400
+    # Grids hold GRID_SCREENS screen heights, and the image height grows with screens
+    if options['screens'] is not None and not 1 <= options['screens'] <= GRID_SCREENS:
+        return jsonify({'error': f'screens must be between 1 and {GRID_SCREENS}'}), 400
+    
+    etag = HeatmapImageCache.key(source, **options)
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+    
+    image = heatmap_images.get(etag)
+    if image is None:
+        image = render_heatmap_png(load_grid(), **options)
+        heatmap_images.put(etag, image)
+    
+    response = Response(image, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Revalidate; unchanged data answers 304
+    return response
+
+def heatmap_filters(args):
+    return {key: args.get(key) for key in ('url', 'persona_id', 'device_type', 'since', 'until')}
+
+def grid_payload(grid):
+    return {
+        'rows': grid.shape[0],
+        'columns': grid.shape[1],
+        'rows_per_screen': GRID_ROWS_PER_SCREEN,
+        'grid': np.round(grid, 4).tolist()
+    }
+
+@app.route('/api/simulations/<simulation_id>/spans')
+def get_simulation_spans(simulation_id):
+    """Get the nested timing spans recorded for a simulation"""
+    simulation = simulation_manager.get_simulation(simulation_id)
+    if not simulation:
+        return jsonify({'error': 'Simulation not found'}), 404
+    return jsonify({'simulation_id': simulation_id, 'spans': (simulation['results'] or {}).get('spans', [])})
+
+@app.route('/api/spans/top')
+def top_spans():
+    """Top phases by total time across the last N completed simulations"""
+    limit = request.args.get('limit', 100, type=int)
+    top = request.args.get('top', 10, type=int)
+    span_trees = simulation_manager.get_recent_spans(limit)
+    return jsonify({'simulations': len(span_trees), 'phases': aggregate_spans(span_trees, top=top)})
+
 @app.route('/api/simulations')
 def list_simulations():
-    """List all simulations"""
-    simulations = simulation_manager.get_all_simulations()
-    return jsonify(simulations)
+    """List simulations newest first, one keyset page at a time.
+
+    Query parameters: limit, cursor (from next_cursor), fields (comma-separated projection),
+    status, persona_id, url, since/until (created_at range) and include_total.
+    """
+    filters = {key: request.args.get(key) for key in ('status', 'persona_id', 'url', 'since', 'until')}
+    fields = request.args.get('fields')
+    
+    try:
+        simulations, next_cursor = simulation_manager.list_simulations(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor'),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+            **filters
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    page = {'simulations': simulations, 'next_cursor': next_cursor}
+    if request.args.get('include_total', '').lower() in ('1', 'true', 'yes'):
+        page['total'] = simulation_manager.count_simulations(**filters)
+    return jsonify(page)
+
+@app.route('/api/batches', methods=['POST'])
+def create_batch():
+    """Expand a personas × URLs × goals × devices matrix into a batch of simulations"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    
+    try:
+        batch_id = batch_manager.create_batch(
+            persona_ids=data.get('persona_ids'),
+            urls=data.get('urls'),
+            goals=data.get('goals'),
+            device_types=data.get('device_types', ['desktop']),
+            repetitions=data.get('repetitions', 1),
+            duration=data.get('duration', 300),
+            parallelism=data.get('parallelism', 4),
+            time_mode=data.get('time_mode', 'real'),
+            engine=data.get('engine', 'selenium'),
+            network_profile=data.get('network_profile', 'full')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    batch = batch_manager.get_batch(batch_id)
+    return jsonify({'batch_id': batch_id, 'total': batch['total'], 'status': batch['status']}), 202
+
+@app.route('/api/batches/<batch_id>')
+def get_batch(batch_id):
+    """Get batch progress and aggregate results"""
+    batch = batch_manager.get_batch(batch_id)
+    if not batch:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(batch)
+
+@app.route('/api/page-cache')
+def page_cache_stats():
+    """Hit/miss counters for the shared page-structure cache"""
+    return jsonify(behavior_simulator.page_cache.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Process metrics in Prometheus text format, or JSON with ?format=json"""
+    if request.args.get('format') == 'json':
+        return jsonify(REGISTRY.to_dict())
+    return Response(REGISTRY.to_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/simulator')
 def simulator_page():
@@ -121,5 +411,9 @@ if __name__ == '__main__':
     # Initialize database
     persona_manager.init_db()
     simulation_manager.init_db()
+    analytics_engine.init_db()
+    batch_manager.init_db()
+    if isinstance(simulation_executor, SimulationQueue):
+        simulation_executor.init_db()
     
     app.run(debug=True, host='0.0.0.0', port=5000)
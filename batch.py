@@ -0,0 +1,209 @@
+import json
+import uuid
+import itertools
+import threading
+import time
+from network import resolve_network_profile
+from database import get_database
+
+
+class BatchManager:
+    """Expands persona × URL × goal × device matrices into simulations and tracks them as one batch"""
+
+    def __init__(self, simulation_manager, executor, db_path='simulator.db', poll_interval=0.5):
+        self.simulation_manager = simulation_manager
+        self.executor = executor
+        self.db_path = db_path
+        self.db = get_database(db_path)
+        self.poll_interval = poll_interval
+
+    def init_db(self):
+        """Initialize the simulation_batches table"""
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS simulation_batches (
+                id TEXT PRIMARY KEY,
+                spec TEXT NOT NULL,  -- JSON string
+                total INTEGER NOT NULL,
+                parallelism INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def expand_matrix(self, persona_ids, urls, goals, device_types=('desktop',), repetitions=1, duration=300,
+                      time_mode='real', engine='selenium', network_profile='full'):
+        """Expand the matrix into individual simulation configs"""
+        configs = []
+        for persona_id, url, goal, device_type in itertools.product(persona_ids, urls, goals, device_types):
+            for _ in range(repetitions):
+                configs.append({
+                    'url': url,
+                    'persona_id': persona_id,
+                    'goal': goal,
+                    'duration': duration,
+                    'device_type': device_type,
+                    'time_mode': time_mode,
+                    'engine': engine,
+                    'network_profile': network_profile
+                })
+        return configs
+
+    def create_batch(self, persona_ids, urls, goals, device_types=('desktop',), repetitions=1,
+                     duration=300, parallelism=4, time_mode='real', engine='selenium', network_profile='full'):
+        """Create every simulation in the matrix and start dispatching them"""
+        # A bare string would otherwise be expanded one character at a time
+        for name, values in (('persona_ids', persona_ids), ('urls', urls), ('goals', goals),
+                             ('device_types', device_types)):
+            if (not isinstance(values, (list, tuple)) or not values
+                    or not all(isinstance(value, str) and value for value in values)):
+                raise ValueError(f'{name} must be a non-empty list of strings')
+        for name, value in (('repetitions', repetitions), ('parallelism', parallelism)):
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError(f'{name} must be a positive integer')
+        configs = self.expand_matrix(persona_ids, urls, goals, device_types, repetitions, duration, time_mode, engine,
+                                     network_profile)
+        if not configs:
+            raise ValueError('Batch matrix is empty')
+        resolve_network_profile({'network_profile': network_profile})
+
+        batch_id = str(uuid.uuid4())
+        spec = {
+            'persona_ids': list(persona_ids),
+            'urls': list(urls),
+            'goals': list(goals),
+            'device_types': list(device_types),
+            'repetitions': repetitions,
+            'duration': duration,
+            'time_mode': time_mode,
+            'engine': engine,
+            'network_profile': network_profile
+        }
+
+        simulations = [(str(uuid.uuid4()), config) for config in configs]
+        # The batch row and its simulations commit together
+        with self.db.transaction() as conn:
+            conn.execute('''
+                INSERT INTO simulation_batches (id, spec, total, parallelism)
+                VALUES (?, ?, ?, ?)
+            ''', (batch_id, json.dumps(spec), len(configs), parallelism))
+            self.simulation_manager.create_simulations(simulations, batch_id=batch_id)
+
+        # A durable queue holds the whole batch and caps its leases, so nothing is lost on restart
+        if hasattr(self.executor, 'enqueue_many'):
+            self.executor.enqueue_many(simulations, batch_id=batch_id, max_parallel=parallelism)
+            return batch_id
+
+        dispatcher = threading.Thread(
+            target=self._dispatch, args=(batch_id, simulations, parallelism),
+            name=f'batch-{batch_id[:8]}', daemon=True
+        )
+        dispatcher.start()
+
+        return batch_id
+
+    def _dispatch(self, batch_id, simulations, parallelism):
+        """Feed simulations to the executor, keeping at most `parallelism` unfinished at once"""
+        pending = list(simulations)
+        submitted = 0
+
+        while pending:
+            finished = self._count_finished(batch_id)
+            while pending and submitted - finished < parallelism:
+                simulation_id, config = pending.pop(0)
+                self.executor.submit(simulation_id, config)
+                submitted += 1
+            if pending:
+                time.sleep(self.poll_interval)
+
+    def _count_finished(self, batch_id):
+        return self.db.query_one('''
+            SELECT COUNT(*) FROM simulations
+            WHERE batch_id = ? AND status IN ('completed', 'failed')
+        ''', (batch_id,))[0]
+
+    def get_batch(self, batch_id):
+        """Get batch progress and aggregate results"""
+        row = self.db.query_one('SELECT id, spec, total, parallelism, created_at FROM simulation_batches WHERE id = ?',
+                                (batch_id,))
+        if not row:
+            return None
+
+        progress = dict(self.db.query('SELECT status, COUNT(*) FROM simulations WHERE batch_id = ? GROUP BY status',
+                                      (batch_id,)))
+        # Per persona/device totals straight from the normalized metrics, without loading any results
+        completed = self.db.query('''
+            SELECT m.persona_id, m.device_type, COUNT(*), SUM(m.success), TOTAL(m.completion_time),
+                   TOTAL(m.time_to_first_interaction), TOTAL(m.confusion_clicks), TOTAL(m.bounce_points)
+            FROM simulations s JOIN simulation_metrics m ON m.simulation_id = s.id
+            WHERE s.batch_id = ? AND s.status = 'completed'
+            GROUP BY m.persona_id, m.device_type
+        ''', (batch_id,))
+
+        total = row[2]
+        finished = progress.get('completed', 0) + progress.get('failed', 0)
+
+        return {
+            'id': row[0],
+            'spec': json.loads(row[1]),
+            'total': total,
+            'parallelism': row[3],
+            'created_at': row[4],
+            'status': 'completed' if finished >= total else 'running',
+            'progress': {
+                'queued': progress.get('queued', 0),
+                'running': progress.get('running', 0),
+                'completed': progress.get('completed', 0),
+                'failed': progress.get('failed', 0),
+                'percent': round(finished / total * 100, 1)
+            },
+            'aggregate': self._aggregate_results(completed)
+        }
+
+    def _aggregate_results(self, rows):
+        """Summarize completed simulations overall and per persona/device from (persona, device, totals...) rows"""
+        overall = _ResultSummary()
+        by_persona = {}
+        by_device = {}
+
+        for persona_id, device_type, *totals in rows:
+            for summary in (overall,
+                            by_persona.setdefault(persona_id, _ResultSummary()),
+                            by_device.setdefault(device_type, _ResultSummary())):
+                summary.add(*totals)
+
+        return {
+            'overall': overall.to_dict(),
+            'by_persona': {key: summary.to_dict() for key, summary in by_persona.items()},
+            'by_device': {key: summary.to_dict() for key, summary in by_device.items()}
+        }
+
+
+class _ResultSummary:
+    """Running totals for a group of simulation results"""
+
+    def __init__(self):
+        self.count = 0
+        self.successes = 0
+        self.completion_time = 0.0
+        self.time_to_first_interaction = 0.0
+        self.confusion_clicks = 0
+        self.bounce_points = 0
+
+    def add(self, count, successes, completion_time, time_to_first_interaction, confusion_clicks, bounce_points):
+        self.count += count
+        self.successes += successes
+        self.completion_time += completion_time
+        self.time_to_first_interaction += time_to_first_interaction
+        self.confusion_clicks += confusion_clicks
+        self.bounce_points += bounce_points
+
+    def to_dict(self):
+        if not self.count:
+            return {'simulations': 0}
+        return {
+            'simulations': self.count,
+            'success_rate': round(self.successes / self.count * 100, 1),
+            'avg_completion_time': round(self.completion_time / self.count, 2),
+            'avg_time_to_first_interaction': round(self.time_to_first_interaction / self.count, 2),
+            'avg_confusion_clicks': round(self.confusion_clicks / self.count, 2),
+            'avg_bounce_points': round(self.bounce_points / self.count, 2)
+        }
@@ -3,35 +3,115 @@ from bs4 import BeautifulSoup
 import time
 import random
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, ElementNotInteractableException
+from selenium.common.exceptions import WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 from persona import PersonaManager
+from browser_pool import BrowserPool
+from clock import RealClock, make_clock
+from settle import PageSettleDetector
+from scoring import PersonaScoringModel
+from goal_checker import IncrementalGoalChecker
+from page_cache import PageStructureCache
+from tracing import Tracer, traced
+from metrics import REGISTRY
+from network import resolve_network_profile
+from events import end_event_data
+from action_log import ActionLog
+from drivers import SeleniumDriver, HttpDriver, DEVICE_PROFILES, BOUNCE_EXCEPTIONS
 import json
+import os
+import threading
+from contextlib import nullcontext
+
+SIMULATIONS_STARTED = REGISTRY.counter('simulator_simulations_started_total', 'Simulations started, by engine')
+SIMULATIONS_COMPLETED = REGISTRY.counter('simulator_simulations_completed_total', 'Simulations finished without error, by engine')
+SIMULATIONS_FAILED = REGISTRY.counter('simulator_simulations_failed_total', 'Simulations that raised or returned an error, by engine')
+
+MAX_REASON_LENGTH = 200
+
+
+def friction_reason(error):
+    """Stable reason for a friction event: the exception class and the first line of its message.
+
+    WebDriver messages carry stack traces and page text after the first line, which would make
+    every bounce reason unique.
+    """
+    # WebDriver exceptions keep the bare message in .msg; str() adds 'Message:' and the stack trace
+    message = (error.msg or '') if isinstance(error, WebDriverException) else str(error)
+    first_line = message.strip().split('\n', 1)[0].strip()
+    reason = f'{type(error).__name__}: {first_line}' if first_line else type(error).__name__
+    return reason[:MAX_REASON_LENGTH]
 
 class BehaviorSimulator:
-    def __init__(self):
-        self.persona_manager = PersonaManager()
+    def __init__(self, browser_pool=None, persona_manager=None, page_cache=None, event_bus=None):
+        self.persona_manager = persona_manager or PersonaManager()
+        self.settle_detector = PageSettleDetector(
+            quiet_period=float(os.environ.get('SETTLE_QUIET_SECONDS', 0.3)),
+            max_wait=float(os.environ.get('SETTLE_MAX_WAIT_SECONDS', 10))
+        )
+        self.browser_pool = browser_pool or BrowserPool(
+            self._setup_browser,
+            max_size=int(os.environ.get('BROWSER_POOL_SIZE', 2)),
+            max_uses=int(os.environ.get('BROWSER_MAX_USES', 25))
+        )
+        self.page_cache = page_cache or PageStructureCache(
+            max_entries=int(os.environ.get('PAGE_CACHE_SIZE', 256)),
+            disk_dir=os.environ.get('PAGE_CACHE_DIR')
+        )
+        # Actions and heatmap points beyond this many per simulation are spilled to disk
+        self.action_log_buffer = int(os.environ.get('ACTION_LOG_BUFFER', 256))
+        self.action_log_dir = os.environ.get('ACTION_LOG_DIR')
+        # Optional SimulationEventBus that receives actions, heatmap points and friction as they happen
+        self.event_bus = event_bus
+        # Per-run state; one simulator instance is shared by concurrent worker threads
+        self._local = threading.local()
+    
+    @property
+    def _clock(self):
+        return getattr(self._local, 'clock', None) or RealClock()
+    
+    def _span(self, name):
+        """Timing span on the current run's tracer (no-op outside a run)"""
+        tracer = getattr(self._local, 'tracer', None)
+        return tracer.span(name) if tracer else nullcontext()
     
     def run_simulation(self, simulation_id, config):
         """Run a complete behavior simulation"""
+        engine = config.get('engine', 'selenium')
+        SIMULATIONS_STARTED.inc(engine=engine)
         persona = self.persona_manager.get_persona(config['persona_id'])
         if not persona:
+            SIMULATIONS_FAILED.inc(engine=engine)
             raise ValueError("Persona not found")
         
-        # Initialize browser
-        driver = self._setup_browser(config['device_type'])
+        # 'virtual' time mode skips persona think time but keeps it on the recorded timeline
+        self._local.clock = make_clock(config.get('time_mode', 'real'))
+        self._local.pending_settle = 0.0
+        self._local.page_cache_stats = {'hits': 0, 'misses': 0}
+        self._local.last_page = None  # (cache key, structure) of the last page this run looked at
+        tracer = self._local.tracer = Tracer()
+        action_log = self._local.action_log = ActionLog(self.action_log_buffer, self.action_log_dir)
+        
+        try:
+            network_profile = resolve_network_profile(config)
+            driver = self._open_driver(config, network_profile)
+        except Exception:
+            SIMULATIONS_FAILED.inc(engine=engine)
+            raise
+        tracer.counters = lambda: (driver.round_trips, driver.round_trip_time)
+        healthy = True
+        event_order = []  # Type of each streamed event, so stored results replay in live order
+        if self.event_bus:
+            self.event_bus.open(simulation_id)
         
         try:
             results = {
                 'simulation_id': simulation_id,
                 'persona': persona,
                 'config': config,
-                'actions': [],
+                'actions': action_log.actions,
                 'analytics': {
                     'time_to_first_interaction': 0,
                     'total_interactions': 0,
@@ -40,39 +120,104 @@ class BehaviorSimulator:
                     'success_rate': 0,
                     'completion_time': 0
                 },
-                'heatmap_data': [],
+                'heatmap_data': action_log.heatmap,
+                'time_mode': self._clock.mode,
+                'engine': driver.engine,
+                'page_cache': self._local.page_cache_stats,
+                'performance': {'steps': [], 'round_trips': 0},
+                'network': {'profile': network_profile['name']},
+                'spans': tracer.to_list(),
+                'event_order': event_order,
                 'success': False,
                 'error_message': None
             }
+            self._publish(results, 'status', {'status': 'running', 'engine': driver.engine})
             
-            start_time = time.time()
+            start_time = self._clock.time()
             
             # Navigate to URL
-            driver.get(config['url'])
+            with self._span('navigate'):
+                driver.navigate(config['url'])
+                self._record_settle(driver.wait_for_settle())
             self._log_action(results, 'page_load', config['url'], start_time)
             
             # Simulate user behavior based on persona
             self._simulate_user_journey(driver, persona, config, results)
             
             # Calculate final analytics
-            results['analytics']['completion_time'] = time.time() - start_time
+            results['analytics']['completion_time'] = self._clock.time() - start_time
             results['analytics']['total_interactions'] = len(results['actions'])
+            results['performance']['round_trips'] = driver.round_trips
+            results['network'].update(driver.network_usage())
             
             # Determine success based on goal completion
             results['success'] = self._evaluate_goal_completion(results, config['goal'])
             results['analytics']['success_rate'] = 1.0 if results['success'] else 0.0
             
+            SIMULATIONS_COMPLETED.inc(engine=engine)
+            self._end_stream(results)
             return results
             
         except Exception as e:
-            return {
+            # A WebDriver failure at this level usually means the session crashed
+            healthy = not isinstance(e, WebDriverException)
+            SIMULATIONS_FAILED.inc(engine=engine)
+            # The failed results do not reference the log, so its spill file goes now
+            action_log.close()
+            # Failed outcomes keep the event order too, so a replayed stream has the live event ids
+            results = {
                 'simulation_id': simulation_id,
                 'error': str(e),
-                'success': False
+                'success': False,
+                'engine': driver.engine,
+                'spans': tracer.to_list(),
+                'event_order': event_order
             }
+            self._end_stream(results)
+            return results
         finally:
-            driver.quit()
+            with self._span('close_driver'):
+                driver.close(healthy=healthy)
+            self._local.tracer = None
+            self._local.action_log = None  # The results' views keep the log alive until persisted
     
+    def _publish(self, results, event_type, data):
+        """Push an event to live subscribers of this simulation's stream"""
+        results['event_order'].append(event_type)
+        if self.event_bus:
+            self.event_bus.publish(results['simulation_id'], event_type, data)
+    
+    def _end_stream(self, results):
+        if self.event_bus:
+            self.event_bus.close(results['simulation_id'], 'end', end_event_data(results))
+    
+    def _record_heatmap_point(self, results, point):
+        self._local.action_log.append_heatmap(**point)
+        self._publish(results, 'heatmap', point)
+    
+    def _record_friction(self, results, kind, event):
+        """Record a confusion click or bounce point"""
+        results['analytics']['confusion_clicks' if kind == 'confusion_click' else 'bounce_points'].append(event)
+        self._publish(results, 'friction', dict(event, kind=kind))
+    
+    @traced('open_driver')
+    def _open_driver(self, config, network_profile):
+        """Open the driver backend chosen by the simulation's engine setting"""
+        engine = config.get('engine', 'selenium')
+        if engine == 'http':
+            return HttpDriver(config['device_type'])
+        if engine == 'selenium':
+            # Borrow a warm browser for this device profile
+            webdriver_session = self.browser_pool.acquire(config['device_type'])
+            try:
+                return SeleniumDriver(webdriver_session, self.settle_detector, self.browser_pool.release,
+                                      network_profile, page_url=config['url'])
+            except Exception:
+                self.browser_pool.release(webdriver_session, healthy=False)
+                raise
+        raise ValueError(f'Unknown engine: {engine}')
+    
+    @traced('setup_browser')
     def _setup_browser(self, device_type):
         """Setup Chrome browser with appropriate options"""
         chrome_options = Options()
@@ -82,14 +227,23 @@ class BehaviorSimulator:
         chrome_options.add_argument('--disable-gpu')
         
         if device_type == 'mobile':
-            chrome_options.add_argument('--window-size=375,667')  # iPhone dimensions
+            profile = DEVICE_PROFILES['mobile']
+            width, height = profile['viewport']
+            chrome_options.add_argument(f'--window-size={width},{height}')
             chrome_options.add_experimental_option("mobileEmulation", {
-                "deviceMetrics": {"width": 375, "height": 667, "pixelRatio": 2},
-                "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_7_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.2 Mobile/15E148 Safari/604.1"
+                "deviceMetrics": {"width": width, "height": height, "pixelRatio": 2},
+                "userAgent": profile['user_agent']
             })
         else:
             chrome_options.add_argument('--window-size=1920,1080')
         
+        # Network events feed per-run bytes transferred; network profiles are applied per run over CDP
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+        if os.environ.get('BROWSER_DISK_CACHE_DIR'):
+            # Pooled browsers share one warm HTTP cache that also survives recycling
+            chrome_options.add_argument(f"--disk-cache-dir={os.environ['BROWSER_DISK_CACHE_DIR']}")
+        
         try:
             driver = webdriver.Chrome(options=chrome_options)
         except:
@@ -97,18 +251,21 @@ class BehaviorSimulator:
             chrome_options.add_argument('--disable-extensions')
             driver = webdriver.Chrome(options=chrome_options)
         
+        self.settle_detector.install(driver)
         return driver
     
+    @traced('simulate_user_journey')
     def _simulate_user_journey(self, driver, persona, config, results):
         """Simulate user journey based on persona characteristics"""
-        wait = WebDriverWait(driver, 10)
-        actions = ActionChains(driver)
-        
         # Get persona traits
         traits = persona['traits']
         tech_savviness = persona['tech_savviness']
         goal = config['goal']
         
+        # Compile persona traits and goal keywords once for the whole journey
+        scoring_model = PersonaScoringModel(persona, goal)
+        goal_checker = IncrementalGoalChecker(goal)
+        
         # Simulate initial page scanning
         self._simulate_page_scan(driver, persona, results)
         
@@ -125,51 +282,67 @@ class BehaviorSimulator:
         action_count = 0
         
         while action_count < max_actions:
+            step_started = time.perf_counter()
+            step_round_trips = driver.round_trips
+            think_time = 0.0
             try:
                 # Find interactive elements
                 interactive_elements = self._find_interactive_elements(driver)
                 
                 if not interactive_elements:
-                    self._log_action(results, 'confusion_click', 'No interactive elements found', time.time())
-                    results['analytics']['confusion_clicks'].append({
-                        'timestamp': time.time(),
+                    self._log_action(results, 'confusion_click', 'No interactive elements found', self._clock.time())
+                    self._record_friction(results, 'confusion_click', {
+                        'timestamp': self._clock.time(),
                         'reason': 'no_interactive_elements'
                     })
                     break
                 
                 # Choose element based on persona and goal
-                chosen_element = self._choose_element(interactive_elements, persona, goal, results)
+                chosen = self._choose_element(interactive_elements, scoring_model, results)
                 
-                if chosen_element:
+                if chosen:
+                    # Only the chosen candidate needs a live element handle
+                    chosen_element = driver.resolve(chosen)
+                    
                     # Simulate realistic interaction
-                    self._perform_interaction(driver, chosen_element, persona, results)
+                    self._perform_interaction(driver, chosen_element, chosen, persona, results)
                     
                     # Wait based on persona
-                    time.sleep(interaction_delay)
+                    think_started = time.perf_counter()
+                    with self._span('persona_think'):
+                        self._clock.sleep(interaction_delay)
+                        think_time = time.perf_counter() - think_started
+                        self._local.tracer.add_sleep(think_time)
                     
                     # Check if goal is potentially completed
-                    if self._check_goal_indicators(driver, goal):
+                    if self._check_goal_indicators(driver, goal_checker):
                         break
                 
                 action_count += 1
                 
-            except (TimeoutException, ElementNotInteractableException) as e:
-                self._log_action(results, 'error', str(e), time.time())
-                results['analytics']['bounce_points'].append({
-                    'timestamp': time.time(),
-                    'reason': str(e)
+            except BOUNCE_EXCEPTIONS as e:
+                self._log_action(results, 'error', str(e), self._clock.time())
+                self._record_friction(results, 'bounce', {
+                    'timestamp': self._clock.time(),
+                    'reason': friction_reason(e)
                 })
                 break
             except Exception as e:
                 # Log unexpected errors but continue
-                self._log_action(results, 'unexpected_error', str(e), time.time())
+                self._log_action(results, 'unexpected_error', str(e), self._clock.time())
                 break
+            finally:
+                # Engine time for the step, excluding deliberate persona think time
+                results['performance']['steps'].append({
+                    'latency': time.perf_counter() - step_started - think_time,
+                    'round_trips': driver.round_trips - step_round_trips
+                })
     
+    @traced('simulate_page_scan')
     def _simulate_page_scan(self, driver, persona, results):
         """Simulate initial page scanning behavior"""
         # Record initial viewport elements for heatmap
-        viewport_height = driver.execute_script("return window.innerHeight")
-        viewport_width = driver.execute_script("return window.innerWidth")
+        viewport_width, viewport_height = self._page_structure(driver)['viewport']
         
         # Simulate eye tracking patterns
         scan_points = []
@@ -185,190 +358,143 @@ class BehaviorSimulator:
             ]
         
         for point in scan_points:
-            results['heatmap_data'].append({
+            self._record_heatmap_point(results, {
                 'x': point[0],
                 'y': point[1],
                 'intensity': random.uniform(0.3, 0.8),
                 'duration': random.uniform(100, 500)
             })
         
-        self._log_action(results, 'page_scan', f'Scanned {len(scan_points)} points', time.time())
+        self._log_action(results, 'page_scan', f'Scanned {len(scan_points)} points', self._clock.time())
     
+    @traced('find_interactive_elements')
     def _find_interactive_elements(self, driver):
         """Find interactive elements on the page"""
-        selectors = [
-            'button', 'a[href]', 'input[type="submit"]', 'input[type="button"]',
-            '[role="button"]', '.btn', '.button', '[onclick]',
-            'input[type="text"]', 'input[type="email"]', 'input[type="password"]',
-            'select', 'textarea'
-        ]
-        
-        elements = []
-        for selector in selectors:
-            try:
-                found_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                for element in found_elements:
-                    if element.is_displayed() and element.is_enabled():
-                        elements.append({
-                            'element': element,
-                            'tag': element.tag_name,
-                            'text': element.text[:50],
-                            'type': element.get_attribute('type'),
-                            'role': element.get_attribute('role'),
-                            'location': element.location,
-                            'size': element.size
-                        })
-            except:
-                continue
-        
-        return elements
+        return self._page_structure(driver)['elements']
     
-    def _choose_element(self, elements, persona, goal, results):
+    def _page_structure(self, driver):
+        """Get the page's element inventory and viewport, reusing structure cached by earlier runs.
+
+        Repeat lookups of an unchanged page within one run (e.g. the page scan, then the first
+        step) reuse it without touching the shared cache or its counters. Empty inventories,
+        which is also what a failed extraction returns, are never cached.
+        """
+        url, fingerprint, viewport = driver.fingerprint()
+        fingerprint = f'{driver.engine}|{viewport[0]}x{viewport[1]}|{fingerprint}'
+        
+        last_page = self._local.last_page
+        if last_page is not None and last_page[0] == (url, fingerprint):
+            return last_page[1]
+        
+        structure = self.page_cache.get(url, fingerprint)
+        stats = self._local.page_cache_stats
+        if structure is not None:
+            stats['hits'] += 1
+        else:
+            stats['misses'] += 1
+            structure = {
+                'elements': driver.find_interactive_elements(),
+                'viewport': viewport
+            }
+            if structure['elements']:
+                self.page_cache.put(url, fingerprint, structure)
+        
+        if structure['elements']:
+            self._local.last_page = ((url, fingerprint), structure)
+        return structure
+    
+    @traced('choose_element')
+    def _choose_element(self, elements, scoring_model, results):
         """Choose which element to interact with based on persona and goal"""
         if not elements:
             return None
         
-        # Score elements based on goal relevance and persona preferences
-        scored_elements = []
-        
-        for elem_info in elements:
-            score = 0
-            text = elem_info['text'].lower()
-            
-            # Goal-based scoring
-            goal_keywords = goal.lower().split()
-            for keyword in goal_keywords:
-                if keyword in text:
-                    score += 5
-            
-            # Persona-based preferences
-            if 'price-conscious' in persona['traits']:
-                if any(word in text for word in ['price', 'cost', 'cheap', 'discount', 'sale']):
-                    score += 3
-            
-            if 'social-proof-driven' in persona['traits']:
-                if any(word in text for word in ['review', 'rating', 'testimonial', 'customer']):
-                    score += 3
-            
-            if 'help-seeking' in persona['traits']:
-                if any(word in text for word in ['help', 'support', 'faq', 'guide', 'tutorial']):
-                    score += 3
-            
-            # Element type preferences
-            if elem_info['tag'] == 'button' or 'button' in (elem_info['role'] or ''):
-                score += 2  # Buttons are naturally appealing
-            
-            # Tech savviness affects interaction with complex elements
-            if persona['tech_savviness'] < 3:
-                if elem_info['tag'] in ['select', 'input'] and elem_info['type'] != 'submit':
-                    score -= 1  # Less tech-savvy users might avoid complex inputs
-            
-            scored_elements.append((elem_info, score))
-        
-        # Sort by score and add some randomness
-        scored_elements.sort(key=lambda x: x[1] + random.uniform(-0.5, 0.5), reverse=True)
-        
-        # Return the highest scoring element
-        if scored_elements:
-            chosen = scored_elements[0][0]
-            self._log_action(results, 'element_chosen', f"Selected: {chosen['text'][:30]}", time.time())
-            return chosen['element']
+        # Score all candidates in one pass with the persona's compiled model
+        best = scoring_model.choose(elements)
+        if best is None:
+            return None
         
-        return None
+        chosen = elements[best]
+        self._log_action(results, 'element_chosen', f"Selected: {chosen['text'][:30]}", self._clock.time())
+        return chosen
     
-    def _perform_interaction(self, driver, element, persona, results):
+    @traced('perform_interaction')
+    def _perform_interaction(self, driver, element, elem_info, persona, results):
         """Perform interaction with an element"""
         try:
             # Scroll element into view
-            driver.execute_script("arguments[0].scrollIntoView(true);", element)
-            time.sleep(0.5)
+            driver.scroll_into_view(element)
+            self._record_settle(driver.wait_after_scroll())
             
-            # Record heatmap data for the interaction
-            location = element.location
-            size = element.size
-            results['heatmap_data'].append({
+            # Record heatmap data for the interaction (document coordinates from the inventory)
+            location = elem_info['location']
+            size = elem_info['size']
+            self._record_heatmap_point(results, {
                 'x': location['x'] + size['width']//2,
                 'y': location['y'] + size['height']//2,
                 'intensity': random.uniform(0.7, 1.0),
                 'duration': random.uniform(200, 800)
             })
             
-            tag_name = element.tag_name.lower()
-            element_type = element.get_attribute('type')
+            tag_name = elem_info['tag']
+            element_type = elem_info['type']
             
             if tag_name == 'input' and element_type in ['text', 'email', 'password']:
                 # Handle text input
-                self._handle_text_input(element, persona, results)
+                self._handle_text_input(driver, element, element_type, persona, results)
             
-            elif tag_name in ['button', 'a'] or element.get_attribute('role') == 'button':
+            elif tag_name in ['button', 'a'] or elem_info['role'] == 'button':
                 # Handle clicks
-                element.click()
-                self._log_action(results, 'click', element.text[:30], time.time())
-                time.sleep(1)  # Wait for page response
+                clicked_at = self._clock.time()
+                driver.click(element)
+                self._record_settle(driver.wait_for_settle())  # Wait for page response
+                self._log_action(results, 'click', elem_info['text'][:30], clicked_at)
             
             elif tag_name == 'select':
-                # Handle dropdown selection
-                from selenium.webdriver.support.ui import Select
-                select = Select(element)
-                if select.options:
-                    # Choose a random option (or goal-relevant one)
-                    option = random.choice(select.options[1:])  # Skip first (usually placeholder)
-                    select.select_by_visible_text(option.text)
-                    self._log_action(results, 'select', option.text[:30], time.time())
+                # Handle dropdown selection (a random non-placeholder option)
+                option_text = driver.select_option(element)
+                if option_text is not None:
+                    self._record_settle(driver.wait_for_settle())
+                    self._log_action(results, 'select', option_text[:30], self._clock.time())
             
         except Exception as e:
-            self._log_action(results, 'interaction_error', str(e), time.time())
-            results['analytics']['confusion_clicks'].append({
-                'timestamp': time.time(),
-                'reason': f'interaction_error: {str(e)}'
+            self._log_action(results, 'interaction_error', str(e), self._clock.time())
+            self._record_friction(results, 'confusion_click', {
+                'timestamp': self._clock.time(),
+                'reason': f'interaction_error: {friction_reason(e)}'
             })
     
-    def _handle_text_input(self, element, persona, results):
+    def _handle_text_input(self, driver, element, input_type, persona, results):
         """Handle text input based on persona"""
-        input_type = element.get_attribute('type')
-        placeholder = element.get_attribute('placeholder') or ''
+        placeholder = driver.get_attribute(element, 'placeholder') or ''
         
         # Generate realistic input based on type and persona
         if input_type == 'email':
             test_email = f"test.user{random.randint(1, 999)}@example.com"
-            element.send_keys(test_email)
-            self._log_action(results, 'input', f'email: {test_email}', time.time())
+            driver.type_text(element, test_email)
+            self._log_action(results, 'input', f'email: {test_email}', self._clock.time())
         
         elif input_type == 'password':
             password = 'TestPassword123!' if persona['tech_savviness'] > 2 else 'password123'
-            element.send_keys(password)
-            self._log_action(results, 'input', 'password: [hidden]', time.time())
+            driver.type_text(element, password)
+            self._log_action(results, 'input', 'password: [hidden]', self._clock.time())
         
         elif 'search' in placeholder.lower() or 'find' in placeholder.lower():
             # Search based on goal
             search_terms = ['product', 'item', 'service', 'help']
-            element.send_keys(random.choice(search_terms))
-            self._log_action(results, 'input', f'search: {element.get_attribute("value")}', time.time())
+            driver.type_text(element, random.choice(search_terms))
+            self._log_action(results, 'input', f'search: {driver.get_attribute(element, "value")}', self._clock.time())
         
         else:
             # Generic text input
             test_text = f'Test Input {random.randint(1, 99)}'
-            element.send_keys(test_text)
-            self._log_action(results, 'input', f'text: {test_text}', time.time())
+            driver.type_text(element, test_text)
+            self._log_action(results, 'input', f'text: {test_text}', self._clock.time())
     
-    def _check_goal_indicators(self, driver, goal):
+    @traced('check_goal_indicators')
+    def _check_goal_indicators(self, driver, goal_checker):
         """Check if there are indicators that the goal might be completed"""
-        goal_keywords = goal.lower().split()
-        page_text = driver.find_element(By.TAG_NAME, 'body').text.lower()
-        
-        success_indicators = [
-            'success', 'complete', 'thank you', 'confirmation', 'done',
-            'submitted', 'added to cart', 'checkout', 'purchase', 'order'
-        ]
-        
-        # Check for success indicators
-        for indicator in success_indicators:
-            if indicator in page_text:
-                return True
-        
-        # Check for goal-specific keywords
-        keyword_matches = sum(1 for keyword in goal_keywords if keyword in page_text)
-        return keyword_matches >= len(goal_keywords) // 2
+        return goal_checker.check(driver)
     
     def _evaluate_goal_completion(self, results, goal):
         """Evaluate if the goal was successfully completed"""
@@ -378,8 +504,12 @@ class BehaviorSimulator:
         if not actions:
             return False
         
-        # Check for successful action patterns
-        action_types = [action['type'] for action in actions]
+        # Check for successful action patterns (one pass; older actions may be read back from disk)
+        action_types = set()
+        details = []
+        for action in actions:
+            action_types.add(action['type'])
+            details.append(action.get('details', ''))
         
         if 'click' in action_types and 'input' in action_types:
             # User interacted meaningfully
@@ -387,20 +517,34 @@ class BehaviorSimulator:
         
         # Check for goal keywords in actions
         goal_keywords = goal.lower().split()
-        action_texts = ' '.join([action.get('details', '') for action in actions]).lower()
+        action_texts = ' '.join(details).lower()
         
         keyword_matches = sum(1 for keyword in goal_keywords if keyword in action_texts)
         return keyword_matches >= len(goal_keywords) // 2
     
+    def _record_settle(self, seconds):
+        """Accumulate page settle time for the next logged action"""
+        self._local.pending_settle = getattr(self._local, 'pending_settle', 0.0) + seconds
+    
     def _log_action(self, results, action_type, details, timestamp):
         """Log an action to the results"""
-        results['actions'].append({
+        action_log = self._local.action_log
+        
+        # Time spent waiting for the page to settle before this action was recorded
+        settle_time = getattr(self._local, 'pending_settle', 0.0)
+        self._local.pending_settle = 0.0
+        
+        action_log.append_action(action_type, details, timestamp, settle_time)
+        action = {
             'type': action_type,
             'details': details,
             'timestamp': timestamp,
-            'relative_time': timestamp - (results['actions'][0]['timestamp'] if results['actions'] else timestamp)
-        })
+            'relative_time': timestamp - action_log.first_timestamp
+        }
+        if settle_time:
+            action['settle_time'] = round(settle_time, 3)
+        self._publish(results, 'action', action)
         
         # Update time to first interaction
         if action_type in ['click', 'input', 'select'] and results['analytics']['time_to_first_interaction'] == 0:
-            results['analytics']['time_to_first_interaction'] = timestamp - (results['actions'][0]['timestamp'] if results['actions'] else timestamp)
+            results['analytics']['time_to_first_interaction'] = timestamp - action_log.first_timestamp
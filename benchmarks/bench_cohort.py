@@ -0,0 +1,115 @@
+"""Cohort analytics benchmark: AnalyticsEngine.cohort_analytics over 10^5 simulations.
+
+Fills a temporary database with synthetic normalized metrics and bounce events, then times
+unfiltered and filtered cohorts and checks the totals against plain SQL. Run from the
+repository root:
+
+    python -m benchmarks.bench_cohort
+    python -m benchmarks.bench_cohort --simulations 200000 --repeats 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from analytics import AnalyticsEngine
+from persona import PersonaManager
+from simulation import SimulationManager
+
+URLS = [f'https://shop{i}.test/' for i in range(5)]
+DEVICES = ['desktop', 'mobile', 'tablet']
+BOUNCE_REASONS = ['timeout', 'element not interactable', 'stale element reference', 'page crashed']
+
+
+def populate(db_path, count, seed=0):
+    rng = np.random.default_rng(seed)
+    persona_ids = [persona['id'] for persona in PersonaManager(db_path).get_all_personas()]
+    simulations = SimulationManager(db_path)
+
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    success = rng.random(count) < 0.62
+    completion = rng.lognormal(3.5, 0.6, count)
+    # A few runs never interact
+    first_interaction = np.where(rng.random(count) < 0.05, 0.0, rng.gamma(2.0, 1.5, count))
+    confusion = rng.poisson(0.8, count)
+    bounces = rng.poisson(0.3, count)
+    days = rng.integers(0, 30, count)
+
+    with simulations.db.transaction() as conn:
+        conn.executemany('''
+            INSERT INTO simulation_metrics
+                (simulation_id, url, persona_id, goal, device_type, engine, completed_at, success, completion_time,
+                 time_to_first_interaction, total_interactions, confusion_clicks, bounce_points, heatmap_points,
+                 round_trips, bytes_transferred)
+            VALUES (?, ?, ?, 'checkout', ?, 'http', datetime('2026-01-01', '+' || ? || ' days'), ?, ?, ?, 10, ?, ?, 0, 0, 0)
+        ''', ((ids[i], URLS[i % len(URLS)], persona_ids[i % len(persona_ids)], DEVICES[i % len(DEVICES)],
+               int(days[i]), int(success[i]), float(completion[i]), float(first_interaction[i]),
+               int(confusion[i]), int(bounces[i])) for i in range(count)))
+        conn.executemany('''
+            INSERT INTO simulation_friction (simulation_id, kind, seq, timestamp, relative_time, reason)
+            VALUES (?, 'bounce', ?, 0, 0, ?)
+        ''', ((ids[i], seq, BOUNCE_REASONS[(i + seq) % len(BOUNCE_REASONS)])
+              for i in range(count) for seq in range(int(bounces[i]))))
+    return persona_ids
+
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cohort analytics')
+    parser.add_argument('--simulations', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'cohort.db')
+        PersonaManager(db_path).init_db()
+        SimulationManager(db_path).init_db()
+        engine = AnalyticsEngine(db_path)
+        engine.init_db()
+
+        started = time.perf_counter()
+        persona_ids = populate(db_path, args.simulations)
+        populate_seconds = time.perf_counter() - started
+
+        cohorts = {
+            'all': {},
+            'url': {'url': URLS[0]},
+            'persona_url_week': {'persona_id': persona_ids[0], 'url': URLS[0],
+                                 'since': '2026-01-08', 'until': '2026-01-15'}
+        }
+        report = {'simulations': args.simulations, 'populate_seconds': round(populate_seconds, 2), 'cohorts': {}}
+        for name, filters in cohorts.items():
+            seconds, result = best_of(lambda: engine.cohort_analytics(**filters), args.repeats)
+            where = ' AND '.join(f'{key} = ?' for key in filters if key in ('url', 'persona_id'))
+            expected = engine.db.query_one(f'''
+                SELECT COUNT(*), SUM(success), TOTAL(bounce_points) FROM simulation_metrics
+                WHERE {where or '1'} AND completed_at >= ? AND completed_at < ?
+            ''', [filters[key] for key in filters if key in ('url', 'persona_id')] +
+                [filters.get('since', '0001-01-01'), filters.get('until', '9999-12-31')])
+            report['cohorts'][name] = {
+                'seconds': round(seconds, 4),
+                'simulations': result['simulations'],
+                'success_rate': result['success']['rate'],
+                'confidence_interval': result['success']['confidence_interval'],
+                'completion_time_p50': result['completion_time'].get('percentiles', {}).get('p50'),
+                'matches_sql': (result['simulations'], result['success']['successes'],
+                                result['friction']['bounce']['total']) == (expected[0], expected[1] or 0, int(expected[2]))
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Heatmap clustering benchmark: grid-bucket clustering on 10^4-10^6 points.
+
+The previous pairwise clustering is timed on small inputs only, since it is quadratic.
+Run from the repository root:
+
+    python -m benchmarks.bench_heatmap
+    python -m benchmarks.bench_heatmap --sizes 10000,100000,1000000 --legacy-sizes 500,1000,2000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from heatmap import cluster_heatmap_grid
+
+
+def legacy_cluster(points, cluster_distance=100):
+    """The greedy pairwise clustering that cluster_heatmap_grid replaced"""
+    zones = []
+    processed = set()
+    for i, point in enumerate(points):
+        if i in processed:
+            continue
+        cluster = [point]
+        processed.add(i)
+        for j, other_point in enumerate(points[i + 1:], i + 1):
+            if j in processed:
+                continue
+            distance = np.sqrt((point['x'] - other_point['x']) ** 2 + (point['y'] - other_point['y']) ** 2)
+            if distance <= cluster_distance:
+                cluster.append(other_point)
+                processed.add(j)
+        if len(cluster) > 1:
+            zones.append(len(cluster))
+    return zones
+
+
+def synthetic_points(count, seed=0):
+    """Clicks concentrated around a few page elements plus uniform scan noise on a 1920x4000 page"""
+    rng = np.random.default_rng(seed)
+    hotspots = rng.uniform((0, 0), (1920, 4000), size=(12, 2))
+    clustered = count * 3 // 4
+    centers = hotspots[rng.integers(0, len(hotspots), clustered)]
+    xy = np.concatenate([
+        centers + rng.normal(0, 40, size=(clustered, 2)),
+        rng.uniform((0, 0), (1920, 4000), size=(count - clustered, 2))
+    ])
+    return xy[:, 0], xy[:, 1], rng.uniform(0.3, 1.0, count)
+
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark heatmap clustering')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Point counts for grid clustering')
+    parser.add_argument('--legacy-sizes', default='500,1000,2000', help='Point counts for the pairwise baseline')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    report = {'grid': [], 'legacy': []}
+
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        x, y, intensity = synthetic_points(size)
+        seconds, zones = best_of(lambda: cluster_heatmap_grid(x, y, intensity), args.repeats)
+
+        # Same zones whatever order the points arrive in
+        order = np.random.default_rng(1).permutation(size)
+        shuffled = cluster_heatmap_grid(x[order], y[order], intensity[order])
+        stable = [(z['points'], round(z['center']['x'], 6), round(z['center']['y'], 6)) for z in zones] == \
+                 [(z['points'], round(z['center']['x'], 6), round(z['center']['y'], 6)) for z in shuffled]
+
+        report['grid'].append({
+            'points': size,
+            'seconds': round(seconds, 4),
+            'points_per_sec': round(size / seconds),
+            'zones': len(zones),
+            'order_independent': stable
+        })
+
+    for size in [int(s) for s in args.legacy_sizes.split(',') if s]:
+        x, y, intensity = synthetic_points(size)
+        points = [{'x': float(a), 'y': float(b), 'intensity': float(c)} for a, b, c in zip(x, y, intensity)]
+        seconds, zones = best_of(lambda: legacy_cluster(points), 1)
+        grid_seconds, _ = best_of(lambda: cluster_heatmap_grid(x, y, intensity), args.repeats)
+        report['legacy'].append({
+            'points': size,
+            'seconds': round(seconds, 4),
+            'grid_seconds': round(grid_seconds, 6),
+            'speedup': round(seconds / grid_seconds),
+            'zones': len(zones)
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
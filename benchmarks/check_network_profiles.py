@@ -0,0 +1,56 @@
+"""Check that no network profile blocks the page being simulated.
+
+Chrome matches blocked-URL patterns anywhere in a URL, and the blocklist also applies to the
+top-level document, so e.g. '*.mov' would block www.movado.com. For every profile and a set of
+target URLs whose names contain blocked extensions or tracker hosts, this checks that the
+patterns sent to Chrome never match the target, while a page's own subresources are still
+blocked. Run from the repository root:
+
+    python -m benchmarks.check_network_profiles
+"""
+import json
+import sys
+
+from network import NETWORK_PROFILES, blocked_url_patterns, resolve_network_profile, url_pattern_matches
+
+TARGET_URLS = [
+    'https://www.movado.com/us/en/watches',
+    'https://shop.gifts.com/',
+    'https://www.webmd.com/a-to-z-guides',
+    'https://www.iconfinder.com/icons',
+    'https://www.cssdesignawards.com/',
+    'https://marketingplatform.google.com/about/analytics/',
+    'https://www.hotjar.com/pricing/',
+    'https://example.com/download.mp4'
+]
+
+# (profile, resource) pairs that must stay blocked on an unrelated page
+STILL_BLOCKED = [
+    ('lean', 'https://example.com/static/logo.png'),
+    ('lean', 'https://example.com/fonts/inter.woff2'),
+    ('dom', 'https://example.com/static/site.css'),
+    ('no-trackers', 'https://www.google-analytics.com/analytics.js')
+]
+
+
+def main():
+    failures = []
+    for name in NETWORK_PROFILES:
+        for url in TARGET_URLS:
+            profile = resolve_network_profile({'network_profile': name, 'url': url})
+            blocking = [p for p in blocked_url_patterns(profile, url) if url_pattern_matches(url, p)]
+            if blocking:
+                failures.append({'profile': name, 'url': url, 'patterns': blocking})
+
+    for name, resource in STILL_BLOCKED:
+        profile = resolve_network_profile({'network_profile': name})
+        if not any(url_pattern_matches(resource, p) for p in blocked_url_patterns(profile, 'https://example.com/')):
+            failures.append({'profile': name, 'resource': resource, 'error': 'no longer blocked'})
+
+    print(json.dumps({'profiles': len(NETWORK_PROFILES), 'targets': len(TARGET_URLS), 'failures': failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Multi-process check of the durable queue: a killed worker's job is re-delivered.
+
+Starts several real `worker.py` processes with a stub simulator against a temporary
+database, enqueues jobs, SIGKILLs the process holding a long-running lease, and checks that
+the job is leased again by another worker and completes. Every other job must complete
+exactly once. Run from the repository root:
+
+    python -m benchmarks.check_workers
+    python -m benchmarks.check_workers --workers 4 --jobs 12 --lease-seconds 3
+"""
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from job_queue import SimulationQueue
+from persona import PersonaManager
+from simulation import SimulationManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubSimulator:
+    """Stands in for BehaviorSimulator: sleeps for the seconds given in the goal ('sleep:N')"""
+
+    def __init__(self, persona_manager=None):
+        self.persona_manager = persona_manager
+
+    def run_simulation(self, simulation_id, config):
+        time.sleep(float(config['goal'].partition(':')[2] or 0))
+        return {
+            'simulation_id': simulation_id,
+            'config': config,
+            'actions': [],
+            'heatmap_data': [],
+            'analytics': {'time_to_first_interaction': 0, 'total_interactions': 0, 'bounce_points': [],
+                          'confusion_clicks': [], 'success_rate': 1.0, 'completion_time': 0},
+            'worker_pid': os.getpid(),
+            'success': True
+        }
+
+
+def wait_for(predicate, timeout, interval=0.1):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(interval)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kill a worker mid-lease and check the job is re-delivered')
+    parser.add_argument('--workers', type=int, default=3, help='worker.py processes to start')
+    parser.add_argument('--jobs', type=int, default=8, help='Short jobs besides the long one')
+    parser.add_argument('--lease-seconds', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'workers.db')
+        personas = PersonaManager(db_path)
+        personas.init_db()
+        simulations = SimulationManager(db_path)
+        simulations.init_db()
+        queue = SimulationQueue(db_path, lease_seconds=args.lease_seconds)
+        queue.init_db()
+        persona_id = personas.get_all_personas()[0]['id']
+
+        def enqueue(goal):
+            simulation_id = str(uuid.uuid4())
+            config = {'url': 'https://stub.test/', 'persona_id': persona_id, 'goal': goal, 'duration': 1,
+                      'device_type': 'desktop'}
+            simulations.create_simulation(simulation_id, config)
+            queue.enqueue(simulation_id, config)
+            return simulation_id
+
+        # Long enough to still be running when its worker is killed, and again after re-delivery
+        long_job = enqueue(f'sleep:{args.lease_seconds * 3}')
+        short_jobs = [enqueue('sleep:0.2') for _ in range(args.jobs)]
+
+        workers = {}
+        for _ in range(args.workers):
+            process = subprocess.Popen(
+                [sys.executable, 'worker.py', '--db', db_path, '--lease-seconds', str(args.lease_seconds),
+                 '--simulator', 'benchmarks.check_workers:StubSimulator'],
+                cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            workers[process.pid] = process
+
+        try:
+            first = wait_for(lambda: (queue.get_job(long_job) or {}).get('lease_owner'), timeout=30)
+            if not first:
+                raise SystemExit('The long job was never leased')
+            victim_pid = int(first.rsplit(':', 2)[1])
+            workers[victim_pid].send_signal(signal.SIGKILL)
+            workers[victim_pid].wait()
+
+            finished = wait_for(
+                lambda: all((queue.get_job(job) or {}).get('status') == 'done' for job in [long_job] + short_jobs),
+                timeout=args.lease_seconds * 10 + 30
+            )
+            job = queue.get_job(long_job)
+            simulation = simulations.get_simulation(long_job)
+        finally:
+            for process in workers.values():
+                if process.poll() is None:
+                    process.terminate()
+            for process in workers.values():
+                process.wait()
+
+        conn = sqlite3.connect(db_path)
+        statuses = dict(conn.execute('SELECT status, COUNT(*) FROM simulations GROUP BY status').fetchall())
+        conn.close()
+
+    report = {
+        'workers': args.workers,
+        'killed_pid': victim_pid,
+        'long_job': {
+            'attempts': job['attempts'],
+            'first_owner': first,
+            'final_owner': job['lease_owner'],
+            'status': job['status'],
+            'simulation_status': simulation['status'],
+            'completed_by_pid': (simulation['results'] or {}).get('worker_pid')
+        },
+        'simulation_statuses': statuses
+    }
+    print(json.dumps(report, indent=2))
+
+    redelivered = (finished and job['attempts'] == 2 and job['lease_owner'] != first
+                   and simulation['status'] == 'completed' and report['long_job']['completed_by_pid'] != victim_pid)
+    if not redelivered or statuses != {'completed': args.jobs + 1}:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
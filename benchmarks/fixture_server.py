@@ -0,0 +1,102 @@
+"""Local HTTP server for the benchmark fixture site.
+
+Serves the static pages in fixture_site/ plus a few generated routes:
+    /links.html?count=N     page with N links
+    /api/products?delay=MS  product list for the SPA page, answered after a delay
+    /api/cart?delay=MS      add-to-cart acknowledgement, answered after a delay
+"""
+import json
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixture_site')
+
+PRODUCTS = [
+    {'name': 'Basic Widget', 'price': 9},
+    {'name': 'Pro Widget', 'price': 29},
+    {'name': 'Widget Bundle', 'price': 49},
+    {'name': 'Widget Gift Card', 'price': 25}
+]
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+
+        if parsed.path == '/links.html':
+            count = int(query.get('count', ['1000'])[0])
+            return self._send('text/html', self._links_page(count))
+
+        if parsed.path in ('/api/products', '/api/cart'):
+            time.sleep(int(query.get('delay', ['0'])[0]) / 1000)
+            payload = PRODUCTS if parsed.path == '/api/products' else {'status': 'added'}
+            return self._send('application/json', json.dumps(payload))
+
+        return super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, content_type, body):
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _links_page(self, count):
+        links = '\n'.join(
+            f'<li><a href="pricing.html?item={i}">Catalog item {i}</a></li>' for i in range(count)
+        )
+        return (
+            '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Catalog</title></head>'
+            f'<body><h1>Catalog ({count} items)</h1><ul>{links}</ul></body></html>'
+        )
+
+
+class FixtureServer:
+    """Runs the fixture site on a background thread; use as a context manager"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        handler = partial(FixtureRequestHandler, directory=FIXTURE_DIR)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, path):
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    with FixtureServer(port=8765) as server:
+        print(f'Serving fixture site at {server.base_url}')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
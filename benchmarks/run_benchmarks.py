@@ -0,0 +1,298 @@
+"""End-to-end throughput benchmarks against the bundled fixture site.
+
+Runs fully offline: the fixture site is served locally and every simulation uses a
+temporary database. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                      # compare against baseline.json
+    python -m benchmarks.run_benchmarks --write-baseline     # record a new baseline
+    python -m benchmarks.run_benchmarks --engines http --runs 5
+
+Reports simulations/sec, p50/p95/p99 per-step latency, driver round-trips per step
+(WebDriver commands for selenium, HTTP requests for http) and peak RSS of the process
+tree, both for BehaviorSimulator.run_simulation and for the Flask API.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.fixture_server import FixtureServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# (fixture page, goal) pairs covering static, form, delayed-render SPA and link-heavy pages
+SCENARIOS = [
+    ('index.html', 'view pricing'),
+    ('form.html', 'sign up'),
+    ('spa.html', 'add to cart'),
+    ('links.html?count=3000', 'find catalog item 1500')
+]
+
+# Metric name -> True when higher is better
+METRIC_DIRECTIONS = {
+    'simulations_per_sec': True,
+    'step_latency_p50_ms': False,
+    'step_latency_p95_ms': False,
+    'step_latency_p99_ms': False,
+    'round_trips_per_step': False,
+    'peak_rss_mb': False,
+    'api_simulations_per_sec': True
+}
+
+
+class PeakRssSampler:
+    """Samples resident memory of this process and its children (e.g. Chrome) in the background"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_bytes / (1024 * 1024), 1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        if os.path.isdir('/proc'):
+            total = sum(self._rss(pid) for pid in self._process_tree(os.getpid()))
+        else:
+            # ru_maxrss is kilobytes on Linux and bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            total = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def _process_tree(self, pid):
+        pids = [pid]
+        for parent in pids:
+            try:
+                for task in os.listdir(f'/proc/{parent}/task'):
+                    with open(f'/proc/{parent}/task/{task}/children') as f:
+                        pids.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+        return pids
+
+    def _rss(self, pid):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+
+def summarize(durations, results):
+    """Aggregate run results into the reported metrics"""
+    steps = [step for r in results for step in r.get('performance', {}).get('steps', [])]
+    latencies_ms = np.array([step['latency'] * 1000 for step in steps]) if steps else np.zeros(1)
+    round_trips = [step['round_trips'] for step in steps]
+
+    return {
+        'simulations': len(results),
+        'failed': sum(1 for r in results if r.get('error')),
+        'simulations_per_sec': round(len(results) / durations, 3) if durations else 0,
+        'step_latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'step_latency_p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+        'step_latency_p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'round_trips_per_step': round(float(np.mean(round_trips)), 2) if round_trips else 0
+    }
+
+
+def simulation_configs(server, persona_ids, engine, runs):
+    configs = []
+    for page, goal in SCENARIOS:
+        for persona_id in persona_ids:
+            for _ in range(runs):
+                configs.append({
+                    'url': server.url(page),
+                    'persona_id': persona_id,
+                    'goal': goal,
+                    'duration': 60,
+                    'device_type': 'desktop',
+                    'time_mode': 'virtual',
+                    'engine': engine
+                })
+    return configs
+
+
+def bench_engine(engine, server, db_path, runs, concurrency):
+    """Benchmark BehaviorSimulator.run_simulation directly"""
+    from behavior_engine import BehaviorSimulator
+    from persona import PersonaManager
+
+    persona_manager = PersonaManager(db_path)
+    simulator = BehaviorSimulator(persona_manager=persona_manager)
+    persona_ids = [p['id'] for p in persona_manager.get_all_personas()]
+
+    if engine == 'selenium':
+        # Pay browser launch up front so throughput reflects warm pooled sessions
+        try:
+            launch_started = time.perf_counter()
+            simulator.browser_pool.warm('desktop', concurrency)
+            launch_seconds = time.perf_counter() - launch_started
+        except Exception as e:
+            return {'skipped': f'Chrome unavailable: {e}'}
+
+    configs = simulation_configs(server, persona_ids, engine, runs)
+
+    with PeakRssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                lambda item: simulator.run_simulation(f'bench-{item[0]}', item[1]),
+                enumerate(configs)
+            ))
+        elapsed = time.perf_counter() - started
+
+    if engine == 'selenium':
+        simulator.browser_pool.shutdown()
+
+    metrics = summarize(elapsed, results)
+    metrics['peak_rss_mb'] = rss.peak_mb
+    if engine == 'selenium':
+        metrics['browser_warmup_sec'] = round(launch_seconds, 2)
+    return metrics
+
+
+def bench_api(engine, server, workdir, runs, concurrency):
+    """Benchmark the Flask API end to end: POST, background execution, polling until done"""
+    os.environ['SIMULATION_WORKERS'] = str(concurrency)
+    os.environ['SIMULATION_EXECUTOR'] = 'thread'
+
+    # app.py creates its managers against ./simulator.db at import time
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app_module = importlib.import_module('app')
+        app_module.persona_manager.init_db()
+        app_module.simulation_manager.init_db()
+        app_module.analytics_engine.init_db()
+        client = app_module.app.test_client()
+
+        persona_ids = [p['id'] for p in client.get('/api/personas').get_json()]
+        configs = simulation_configs(server, persona_ids, engine, runs)
+
+        started = time.perf_counter()
+        simulation_ids = [client.post('/api/simulations', json=config).get_json()['simulation_id']
+                          for config in configs]
+        pending = set(simulation_ids)
+        while pending:
+            for simulation_id in list(pending):
+                status = client.get(f'/api/simulations/{simulation_id}').get_json()['status']
+                if status in ('completed', 'failed'):
+                    pending.discard(simulation_id)
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        failed = sum(1 for simulation_id in simulation_ids
+                     if client.get(f'/api/simulations/{simulation_id}').get_json()['status'] == 'failed')
+        app_module.simulation_executor.shutdown(wait=True)
+        if engine == 'selenium':
+            app_module.behavior_simulator.browser_pool.shutdown()
+    finally:
+        os.chdir(cwd)
+
+    return {
+        'api_simulations_per_sec': round(len(configs) / elapsed, 3) if elapsed else 0,
+        'api_failed': failed
+    }
+
+
+def compare(report, baseline, tolerance):
+    """List metrics that regressed by more than `tolerance` (a fraction) against the baseline"""
+    regressions = []
+    for engine, metrics in report['engines'].items():
+        base = baseline.get('engines', {}).get(engine, {})
+        for name, higher_is_better in METRIC_DIRECTIONS.items():
+            if name not in metrics or not base.get(name):
+                continue
+            change = (metrics[name] - base[name]) / base[name]
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f'{engine}.{name}: {base[name]} -> {metrics[name]} ({change:+.0%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run simulator throughput benchmarks')
+    parser.add_argument('--engines', default='selenium,http', help='Comma-separated engines to benchmark')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per scenario and persona')
+    parser.add_argument('--concurrency', type=int, default=2, help='Simulations run in parallel')
+    parser.add_argument('--skip-api', action='store_true', help='Skip the Flask API benchmark')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file to compare against or write')
+    parser.add_argument('--write-baseline', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed regression as a fraction')
+    parser.add_argument('--output', help='Also write the report JSON to this path')
+    args = parser.parse_args()
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'settings': {'runs': args.runs, 'concurrency': args.concurrency, 'scenarios': SCENARIOS},
+        'engines': {}
+    }
+
+    with tempfile.TemporaryDirectory() as workdir, FixtureServer() as server:
+        from persona import PersonaManager
+        db_path = os.path.join(workdir, 'bench.db')
+        PersonaManager(db_path).init_db()
+
+        for engine in args.engines.split(','):
+            metrics = bench_engine(engine, server, db_path, args.runs, args.concurrency)
+            if 'skipped' not in metrics and not args.skip_api:
+                metrics.update(bench_api(engine, server, workdir, args.runs, args.concurrency))
+            report['engines'][engine] = metrics
+
+    print(json.dumps(report['engines'], indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.write_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print('Regressions against baseline:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print('No regressions against baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Concurrency stress test for the shared SQLite layer.
+
+Several processes, each with several threads, hammer one temporary database through
+PersonaManager, SimulationManager, BatchManager-style batched writes and AnalyticsEngine:
+creating simulations, moving them through statuses, storing results and reading lists,
+single rows, heatmap aggregates and analytics. Every operation must succeed (no
+"database is locked") and the final row counts must match what was written. Run from the
+repository root:
+
+    python -m benchmarks.stress_db
+    python -m benchmarks.stress_db --processes 4 --threads 8 --seconds 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+from analytics import AnalyticsEngine
+from database import get_database
+from persona import PersonaManager
+from simulation import SimulationManager
+
+OPERATIONS = ('create', 'create_batch', 'status', 'results', 'get', 'list', 'personas', 'aggregate', 'analytics')
+
+
+def fake_results(simulation_id, config, rng):
+    actions = [{'type': 'page_load', 'details': config['url'], 'timestamp': 0.0, 'relative_time': 0.0}]
+    for step in range(1, rng.randint(5, 40)):
+        kind = rng.choice(['click', 'page_scan', 'element_chosen', 'input', 'confusion_click'])
+        actions.append({'type': kind, 'details': f'step {step}', 'timestamp': step * 0.5, 'relative_time': step * 0.5})
+    return {
+        'simulation_id': simulation_id,
+        'config': config,
+        'success': True,
+        'actions': actions,
+        'heatmap_data': [{'x': rng.randint(0, 1920), 'y': rng.randint(0, 4000),
+                          'intensity': rng.random(), 'duration': rng.random()} for _ in range(rng.randint(5, 60))],
+        'friction_points': [],
+        'goal_achieved': rng.random() < 0.5
+    }
+
+
+def worker_thread(db_path, seconds, seed, counts, errors, created):
+    rng = random.Random(seed)
+    personas = PersonaManager(db_path)
+    simulations = SimulationManager(db_path)
+    analytics = AnalyticsEngine(db_path)
+    persona_ids = [persona['id'] for persona in personas.get_all_personas()]
+    mine = []
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        operation = rng.choice(OPERATIONS) if mine else 'create'
+        try:
+            if operation == 'create':
+                simulation_id = str(uuid.uuid4())
+                simulations.create_simulation(simulation_id, {
+                    'url': f'https://site{rng.randint(1, 3)}.test/', 'persona_id': rng.choice(persona_ids),
+                    'goal': 'stress', 'duration': 60, 'device_type': rng.choice(['desktop', 'mobile'])
+                })
+                mine.append(simulation_id)
+                created[0] += 1
+            elif operation == 'create_batch':
+                batch = [(str(uuid.uuid4()), {'url': 'https://batch.test/', 'persona_id': rng.choice(persona_ids),
+                                              'goal': 'stress', 'duration': 60, 'device_type': 'desktop'})
+                         for _ in range(rng.randint(2, 20))]
+                db = get_database(db_path)
+                # Several manager writes batched into one transaction
+                with db.transaction():
+                    simulations.create_simulations(batch, batch_id=str(uuid.uuid4()))
+                    for simulation_id, _ in batch[:3]:
+                        simulations.update_simulation_status(simulation_id, 'running')
+                mine.extend(simulation_id for simulation_id, _ in batch)
+                created[0] += len(batch)
+            elif operation == 'status':
+                simulations.update_simulation_status(rng.choice(mine), rng.choice(['running', 'queued']))
+            elif operation == 'results':
+                simulation_id = rng.choice(mine)
+                simulation = simulations.get_simulation(simulation_id)
+                config = {key: simulation[key] for key in ('url', 'persona_id', 'goal', 'duration', 'device_type')}
+                results = fake_results(simulation_id, config, rng)
+                simulations.update_simulation_results(simulation_id, results)
+                analytics.materialize(simulation_id, results)
+            elif operation == 'get':
+                simulations.get_simulation(rng.choice(mine))
+            elif operation == 'list':
+                simulations.get_recent_spans(limit=20)
+            elif operation == 'personas':
+                personas.get_persona(rng.choice(persona_ids))
+            elif operation == 'aggregate':
+                simulations.aggregate_heatmap_grids(url=f'https://site{rng.randint(1, 3)}.test/')
+            elif operation == 'analytics':
+                analytics.get_materialized_json(rng.choice(mine))
+            counts[operation] = counts.get(operation, 0) + 1
+        except Exception as error:
+            errors.append(f'{operation}: {error!r}')
+            if len(errors) == 1:
+                traceback.print_exc()
+
+
+def worker_process(db_path, threads, seconds, seed, queue):
+    counts = [{} for _ in range(threads)]
+    errors = []
+    created = [[0] for _ in range(threads)]
+    pool = [threading.Thread(target=worker_thread, args=(db_path, seconds, seed * 1000 + index,
+                                                         counts[index], errors, created[index]))
+            for index in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    totals = {}
+    for thread_counts in counts:
+        for operation, count in thread_counts.items():
+            totals[operation] = totals.get(operation, 0) + count
+    queue.put({'counts': totals, 'errors': errors, 'created': sum(c[0] for c in created)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress the shared SQLite layer from many threads and processes')
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=6, help='Threads per process')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'stress.db')
+        PersonaManager(db_path).init_db()
+        SimulationManager(db_path).init_db()
+        AnalyticsEngine(db_path).init_db()
+
+        # Fork only after the parent is done with its own connections; children reopen theirs
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [context.Process(target=worker_process, args=(db_path, args.threads, args.seconds, index, queue))
+                     for index in range(args.processes)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        counts = {}
+        for report in reports:
+            for operation, count in report['counts'].items():
+                counts[operation] = counts.get(operation, 0) + count
+        errors = [error for report in reports for error in report['errors']]
+        created = sum(report['created'] for report in reports)
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute('SELECT COUNT(*) FROM simulations').fetchone()[0]
+        journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        integrity = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        conn.close()
+
+    total = sum(counts.values())
+    summary = {
+        'processes': args.processes,
+        'threads_per_process': args.threads,
+        'seconds': round(elapsed, 2),
+        'operations': total,
+        'operations_per_sec': round(total / elapsed),
+        'by_operation': counts,
+        'errors': len(errors),
+        'first_errors': errors[:5],
+        'simulations_created': created,
+        'simulations_stored': stored,
+        'journal_mode': journal_mode,
+        'integrity_check': integrity
+    }
+    print(json.dumps(summary, indent=2))
+
+    if errors or stored != created or integrity != 'ok':
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
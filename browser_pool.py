@@ -0,0 +1,166 @@
+import threading
+import time
+import atexit
+from urllib.parse import urlparse
+
+from metrics import REGISTRY
+
+BROWSER_LAUNCH_SECONDS = REGISTRY.histogram('simulator_browser_launch_seconds', 'Time to launch a new browser session')
+
+
+class BrowserPool:
+    """Pool of warm browser sessions keyed by device profile"""
+
+    def __init__(self, launcher, max_size=2, max_uses=25, acquire_timeout=120):
+        self.launcher = launcher
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Condition()
+        self._idle = {}  # device_type -> [driver, ...]
+        self._live = {}  # device_type -> number of launched drivers
+        self._uses = {}  # id(driver) -> (device_type, use count)
+        self._closed = False
+
+        atexit.register(self.shutdown)
+
+    def acquire(self, device_type):
+        """Hand out a warm driver for the device profile, launching one if needed"""
+        deadline = time.time() + self.acquire_timeout
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Browser pool is shut down')
+
+                idle = self._idle.setdefault(device_type, [])
+                if idle:
+                    driver = idle.pop()
+                    key, uses = self._uses[id(driver)]
+                    self._uses[id(driver)] = (key, uses + 1)
+                    return driver
+
+                if self._live.get(device_type, 0) < self.max_size:
+                    self._live[device_type] = self._live.get(device_type, 0) + 1
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f'No {device_type} browser available after {self.acquire_timeout}s')
+                self._lock.wait(remaining)
+
+        # Launch outside the lock so other profiles are not blocked on Chrome startup
+        try:
+            with BROWSER_LAUNCH_SECONDS.time(device_type=device_type):
+                driver = self.launcher(device_type)
+        except Exception:
+            with self._lock:
+                self._live[device_type] -= 1
+                self._lock.notify_all()
+            raise
+
+        with self._lock:
+            self._uses[id(driver)] = (device_type, 1)
+        return driver
+
+    def release(self, driver, healthy=True):
+        """Return a driver to the pool, recycling it when worn out or broken"""
+        with self._lock:
+            device_type, uses = self._uses.get(id(driver), (None, 0))
+
+        recycle = not healthy or self._closed or uses >= self.max_uses
+        if not recycle:
+            try:
+                self._reset(driver)
+            except Exception:
+                # A crashed or hung session cannot be reset; replace it
+                recycle = True
+
+        if recycle:
+            self._discard(driver)
+            return
+
+        with self._lock:
+            self._idle.setdefault(device_type, []).append(driver)
+            self._lock.notify_all()
+
+    def warm(self, device_type, count=1):
+        """Pre-launch drivers so the first simulations skip Chrome startup"""
+        drivers = []
+        for _ in range(count):
+            with self._lock:
+                if self._live.get(device_type, 0) >= self.max_size:
+                    break
+            drivers.append(self.acquire(device_type))
+        for driver in drivers:
+            self.release(driver)
+        return len(drivers)
+
+    def stats(self):
+        """Get current pool occupancy per device profile"""
+        with self._lock:
+            return {
+                device_type: {
+                    'live': live,
+                    'idle': len(self._idle.get(device_type, [])),
+                    'in_use': live - len(self._idle.get(device_type, []))
+                }
+                for device_type, live in self._live.items()
+            }
+
+    def shutdown(self):
+        """Quit every idle driver and refuse further acquisitions"""
+        with self._lock:
+            self._closed = True
+            drivers = [d for idle in self._idle.values() for d in idle]
+            self._idle = {}
+            self._lock.notify_all()
+
+        for driver in drivers:
+            self._discard(driver)
+
+    def _reset(self, driver):
+        """Clear cookies, storage and extra tabs left behind by the previous run"""
+        # Every origin the run's tabs navigated to (followed links, cross-host form posts)
+        # may have left localStorage or IndexedDB behind, not just the one we end up on
+        handles = driver.window_handles
+        origins = set()
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            origins.update(self._visited_origins(driver))
+            if handle != handles[0]:
+                driver.close()
+        driver.switch_to.window(handles[0])
+
+        for origin in sorted(origins):
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.delete_all_cookies()
+        driver.get('about:blank')
+
+    @staticmethod
+    def _visited_origins(driver):
+        """http(s) origins in the current tab's navigation history"""
+        history = driver.execute_cdp_cmd('Page.getNavigationHistory', {})
+        urls = [entry.get('url', '') for entry in history.get('entries', [])] + [driver.current_url]
+        origins = set()
+        for url in urls:
+            parsed = urlparse(url)
+            if parsed.scheme in ('http', 'https') and parsed.netloc:
+                origins.add(f'{parsed.scheme}://{parsed.netloc}')
+        return origins
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        with self._lock:
+            device_type, _ = self._uses.pop(id(driver), (None, 0))
+            if device_type is not None:
+                self._live[device_type] -= 1
+            self._lock.notify_all()
+
+        try:
+            driver.quit()
+        except Exception:
+            pass
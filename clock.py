@@ -0,0 +1,42 @@
+import time
+
+
+class RealClock:
+    """Wall clock: persona think time really sleeps"""
+
+    mode = 'real'
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        """Deliberate persona think time"""
+        time.sleep(seconds)
+
+
+class VirtualClock(RealClock):
+    """Time-compressed clock: persona think time advances a virtual offset instead of sleeping.
+
+    Timestamps stay on the persona's modeled timeline (real elapsed time plus skipped think
+    time), so recorded relative times and analytics read as if the waits had happened.
+    """
+
+    mode = 'virtual'
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self):
+        return time.time() + self.offset
+
+    def sleep(self, seconds):
+        self.offset += seconds
+
+
+def make_clock(mode):
+    """Build the clock for a simulation's time_mode ('real' or 'virtual')"""
+    if mode == 'virtual':
+        return VirtualClock()
+    if mode in (None, 'real'):
+        return RealClock()
+    raise ValueError(f'Unknown time_mode: {mode}')
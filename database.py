@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_path='simulator.db'):
+    """The shared Database for a path, so every manager on a thread reuses one connection"""
+    key = os.path.abspath(db_path)
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = Database(db_path)
+        return database
+
+
+def release_connections():
+    """Return this thread's connections to their pools, e.g. when a web request ends"""
+    with _databases_lock:
+        databases = list(_databases.values())
+    for database in databases:
+        database.release()
+
+
+class Database:
+    """Persistent, tuned SQLite connections, one per thread at a time.
+
+    A thread opens its connection once and keeps it, so the pragmas below are applied once
+    and the connection's statement cache keeps recently used queries prepared. Threads that
+    only live for one unit of work (e.g. the dev server's thread per request) hand theirs
+    back with `release()`, and the next thread picks it up from a small idle pool.
+    Connections run in autocommit mode; writes go through `transaction()`, which takes the
+    write lock up front with BEGIN IMMEDIATE and joins an enclosing transaction when nested,
+    so several manager calls can be batched into one commit.
+
+    WAL mode needs shared memory, so every process using the file must be on the same host
+    and the file must not be on a network filesystem. Set SQLITE_JOURNAL_MODE=DELETE for a
+    database on shared storage.
+    """
+
+    def __init__(self, db_path='simulator.db', busy_timeout=30):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.journal_mode = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL').upper()
+        self.cache_size_kb = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16384))
+        self.mmap_size = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+        self.cached_statements = int(os.environ.get('SQLITE_CACHED_STATEMENTS', 256))
+        self.pool_size = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+        self._local = threading.local()
+        self._idle = []  # (pid, connection) released by finished threads
+        self._idle_lock = threading.Lock()
+
+    def connection(self):
+        """This thread's connection, taken from the idle pool or opened on first use (and again after a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._take_idle() or self._open()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+        return conn
+
+    def release(self):
+        """Hand this thread's connection to the idle pool; a no-op inside a transaction"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.depth:
+            return
+        self._local.conn = None
+        if self._local.pid != os.getpid() or conn.in_transaction:
+            return
+        with self._idle_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((self._local.pid, conn))
+                return
+        conn.close()
+
+    def _take_idle(self):
+        pid = os.getpid()
+        with self._idle_lock:
+            while self._idle:
+                owner, conn = self._idle.pop()
+                # Connections inherited across a fork belong to the parent
+                if owner == pid:
+                    return conn
+        return None
+
+    def _open(self):
+        # Pooled connections move between threads, but only one thread uses a connection at a time
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                               cached_statements=self.cached_statements, check_same_thread=False)
+        # WAL lets readers proceed while a writer commits; it is stored in the file, so this is a no-op after the first time
+        conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption; rollback journals need FULL
+        conn.execute(f"PRAGMA synchronous={'NORMAL' if self.journal_mode == 'WAL' else 'FULL'}")
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in one write transaction, committing on success and rolling back on error"""
+        conn = self.connection()
+        if self._local.depth:
+            # Already inside a transaction on this thread; the outermost block commits
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.depth = 0
+
+    def execute(self, sql, params=()):
+        """Run one statement; outside a transaction it commits on its own"""
+        return self.connection().execute(sql, params)
+
+    def query(self, sql, params=()):
+        """All rows of a query, fetched eagerly so no read snapshot is left open"""
+        cursor = self.connection().execute(sql, params)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def query_one(self, sql, params=()):
+        cursor = self.connection().execute(sql, params)
+        try:
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Close this thread's connection; the next call opens a fresh one"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,440 @@
+import hashlib
+import random
+import time
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import TimeoutException, ElementNotInteractableException, WebDriverException
+from goal_checker import MATCH_TERMS_SCRIPT
+from network import NetworkUsage, apply_network_profile
+
+
+DEVICE_PROFILES = {
+    'desktop': {
+        'viewport': (1920, 1080),
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+    },
+    'mobile': {
+        'viewport': (375, 667),  # iPhone dimensions
+        'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_7_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.2 Mobile/15E148 Safari/604.1'
+    }
+}
+
+# Union of every interactive selector; both backends return each node once, in document order
+INTERACTIVE_SELECTOR = ', '.join([
+    'button', 'a[href]', 'input[type="submit"]', 'input[type="button"]',
+    '[role="button"]', '.btn', '.button', '[onclick]',
+    'input[type="text"]', 'input[type="email"]', 'input[type="password"]',
+    'select', 'textarea'
+])
+
+# Walks the DOM once and returns compact rows of
+# [tag, text, type, role, x, y, width, height, in_viewport, node_index] for displayed, enabled
+# candidates. node_index is the position in querySelectorAll, so a handle can be resolved later
+# (even from a cached inventory) without re-running the walk.
+INTERACTIVE_ELEMENTS_SCRIPT = """
+const nodes = document.querySelectorAll(arguments[0]);
+const rows = [];
+const vw = window.innerWidth, vh = window.innerHeight;
+for (let i = 0; i < nodes.length; i++) {
+    const el = nodes[i];
+    if (el.disabled) continue;
+    const rect = el.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0) continue;
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none' || parseFloat(style.opacity) === 0) continue;
+    rows.push([
+        el.tagName.toLowerCase(),
+        (el.innerText || '').trim().slice(0, 50),
+        el.type !== undefined ? el.type : el.getAttribute('type'),
+        el.getAttribute('role'),
+        Math.round(rect.left + window.scrollX),
+        Math.round(rect.top + window.scrollY),
+        Math.round(rect.width),
+        Math.round(rect.height),
+        rect.bottom > 0 && rect.right > 0 && rect.top < vh && rect.left < vw,
+        i
+    ]);
+}
+return rows;
+"""
+
+RESOLVE_ELEMENT_SCRIPT = """
+const el = document.querySelectorAll(arguments[0])[arguments[1]];
+return el && el.tagName.toLowerCase() === arguments[2] ? el : null;
+"""
+
+# Cheap structural fingerprint of the current document plus the viewport size:
+# [url, fingerprint, width, height]
+PAGE_FINGERPRINT_SCRIPT = """
+const body = document.body;
+return [
+    location.href,
+    [document.title, document.getElementsByTagName('*').length,
+     document.querySelectorAll(arguments[0]).length,
+     body ? body.textContent.length : 0,
+     document.documentElement.scrollHeight, document.readyState].join('|'),
+    window.innerWidth,
+    window.innerHeight
+];
+"""
+
+# Errors that mean the persona gave up on the page rather than the engine failing
+BOUNCE_EXCEPTIONS = (
+    TimeoutException, ElementNotInteractableException,
+    requests.Timeout, requests.ConnectionError
+)
+
+
+def candidate_from_row(index, row):
+    """Build the element info dict shared by every backend from a compact inventory row"""
+    tag, text, elem_type, role, x, y, width, height, in_viewport, node_index = row
+    return {
+        'index': index,
+        'node_index': node_index,
+        'tag': tag,
+        'text': text,
+        'type': elem_type,
+        'role': role,
+        'location': {'x': x, 'y': y},
+        'size': {'width': width, 'height': height},
+        'in_viewport': in_viewport
+    }
+
+
+def count_commands(webdriver):
+    """Count and time every WebDriver command sent to chromedriver, element calls included"""
+    if getattr(webdriver, 'command_count', None) is not None:
+        return webdriver
+
+    execute = webdriver.execute
+    webdriver.command_count = 0
+    webdriver.command_time = 0.0
+
+    def counting_execute(driver_command, params=None):
+        webdriver.command_count += 1
+        started = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            webdriver.command_time += time.perf_counter() - started
+
+    # WebElement methods go through their parent driver's execute, so one hook sees everything
+    webdriver.execute = counting_execute
+    return webdriver
+
+
+class SeleniumDriver:
+    """Backend that drives a pooled headless Chrome session"""
+
+    engine = 'selenium'
+
+    def __init__(self, webdriver, settle_detector, release, network_profile, page_url=None):
+        self.webdriver = count_commands(webdriver)
+        self.settle_detector = settle_detector
+        self._release = release
+        self._commands_at_start = webdriver.command_count
+        self._command_time_at_start = webdriver.command_time
+
+        # Discard network events left over from the session's previous run
+        NetworkUsage().drain(self.webdriver)
+        self._network_usage = NetworkUsage()
+        apply_network_profile(self.webdriver, network_profile, page_url)
+
+    @property
+    def round_trips(self):
+        """WebDriver commands issued since this backend was opened"""
+        return self.webdriver.command_count - self._commands_at_start
+
+    @property
+    def round_trip_time(self):
+        """Seconds spent waiting on WebDriver commands since this backend was opened"""
+        return self.webdriver.command_time - self._command_time_at_start
+
+    def navigate(self, url):
+        self.webdriver.get(url)
+
+    def viewport(self):
+        """Get (width, height) of the viewport"""
+        width, height = self.webdriver.execute_script('return [window.innerWidth, window.innerHeight]')
+        return width, height
+
+    def fingerprint(self):
+        """Get (url, DOM fingerprint, viewport) in one round-trip"""
+        url, fingerprint, width, height = self.webdriver.execute_script(PAGE_FINGERPRINT_SCRIPT, INTERACTIVE_SELECTOR)
+        return url, fingerprint, (width, height)
+
+    def find_interactive_elements(self):
+        """Inventory interactive elements in a single script round-trip"""
+        try:
+            rows = self.webdriver.execute_script(INTERACTIVE_ELEMENTS_SCRIPT, INTERACTIVE_SELECTOR)
+        except WebDriverException:
+            return []
+        return [candidate_from_row(index, row) for index, row in enumerate(rows or [])]
+
+    def resolve(self, elem_info):
+        """Resolve the WebElement handle for a chosen candidate"""
+        element = self.webdriver.execute_script(
+            RESOLVE_ELEMENT_SCRIPT, INTERACTIVE_SELECTOR, elem_info['node_index'], elem_info['tag']
+        )
+        if element is None:
+            raise ElementNotInteractableException(f"Element is no longer attached: {elem_info['text'][:30]}")
+        return element
+
+    def scroll_into_view(self, element):
+        self.webdriver.execute_script('arguments[0].scrollIntoView(true);', element)
+
+    def click(self, element):
+        element.click()
+
+    def type_text(self, element, text):
+        element.send_keys(text)
+
+    def select_option(self, element):
+        """Choose a random non-placeholder option; returns its text"""
+        select = Select(element)
+        if not select.options:
+            return None
+        option = random.choice(select.options[1:])  # Skip first (usually placeholder)
+        select.select_by_visible_text(option.text)
+        return option.text
+
+    def get_attribute(self, element, name):
+        return element.get_attribute(name)
+
+    def page_text(self):
+        return self.webdriver.find_element(By.TAG_NAME, 'body').text
+
+    def match_terms(self, terms, key):
+        """Indices of lowercased terms present on the page, matched in-page incrementally"""
+        return set(self.webdriver.execute_script(MATCH_TERMS_SCRIPT, terms, key) or [])
+
+    def wait_for_settle(self):
+        """Wait for the page to settle after navigation or an interaction; returns seconds waited"""
+        return self.settle_detector.wait(self.webdriver)
+
+    def wait_after_scroll(self):
+        return self.settle_detector.wait_after_scroll(self.webdriver)
+
+    def network_usage(self):
+        """Bytes and requests seen on the wire since this backend was opened"""
+        return self._network_usage.drain(self.webdriver).to_dict()
+
+    def close(self, healthy=True):
+        self._release(self.webdriver, healthy=healthy)
+
+
+class HttpDriver:
+    """Lightweight backend that fetches pages over HTTP and parses them with BeautifulSoup.
+
+    No JavaScript runs and there is no layout, so element positions are estimated from
+    document order. Links are followed and forms are submitted with the values typed so far.
+    """
+
+    engine = 'http'
+    row_height = 48
+
+    def __init__(self, device_type, timeout=15):
+        profile = DEVICE_PROFILES.get(device_type, DEVICE_PROFILES['desktop'])
+        self.viewport_size = profile['viewport']
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = profile['user_agent']
+        self.round_trips = 0  # HTTP requests issued
+        self.round_trip_time = 0.0
+        self.bytes_transferred = 0
+
+        self.url = None
+        self.soup = None
+        self._candidates = None
+        self._values = {}  # id(tag) -> value typed or selected
+        self._lower_text = None
+        self._fingerprint = None
+
+    def navigate(self, url, method='GET', data=None):
+        self.round_trips += 1
+        started = time.perf_counter()
+        try:
+            if method == 'POST':
+                response = self.session.post(url, data=data, timeout=self.timeout)
+            else:
+                response = self.session.get(url, params=data, timeout=self.timeout)
+        finally:
+            self.round_trip_time += time.perf_counter() - started
+
+        # Content-Length is the on-the-wire (possibly compressed) size when the server sends it
+        self.bytes_transferred += int(response.headers.get('Content-Length') or len(response.content))
+        self.url = response.url
+        self._fingerprint = hashlib.sha1(response.content).hexdigest()
+        self.soup = BeautifulSoup(response.text, 'html.parser')
+        for tag in self.soup(['script', 'style', 'noscript', 'template']):
+            tag.decompose()
+        self._candidates = None
+        self._values = {}
+        self._lower_text = None
+
+    def viewport(self):
+        return self.viewport_size
+
+    def fingerprint(self):
+        """Get (url, content hash, viewport); the parsed document never changes between fetches"""
+        return self.url, self._fingerprint, self.viewport_size
+
+    def find_interactive_elements(self):
+        """Inventory interactive elements from the parsed document"""
+        if self.soup is None:
+            return []
+
+        width, height = self.viewport_size
+        elements = []
+
+        for node_index, tag in enumerate(self._select_candidates()):
+            if self._is_hidden(tag):
+                continue
+
+            index = len(elements)
+            text = tag.get_text(' ', strip=True)[:50]
+            y = 20 + index * self.row_height
+            elements.append(candidate_from_row(index, [
+                tag.name,
+                text,
+                self._element_type(tag),
+                tag.get('role'),
+                20,
+                y,
+                min(width - 40, 8 * len(text) + 32),
+                self.row_height - 8,
+                y < height,
+                node_index
+            ]))
+
+        return elements
+
+    def resolve(self, elem_info):
+        return self._select_candidates()[elem_info['node_index']]
+
+    def _select_candidates(self):
+        # Selector matches are computed once per fetched document
+        if self._candidates is None:
+            self._candidates = self.soup.select(INTERACTIVE_SELECTOR)
+        return self._candidates
+
+    def scroll_into_view(self, element):
+        pass
+
+    def click(self, element):
+        """Follow a link or submit the element's form"""
+        if element.name == 'a':
+            href = element.get('href', '')
+            if href and not href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+                self.navigate(urljoin(self.url, href))
+            return
+
+        form = element.find_parent('form')
+        if form is not None and self._element_type(element) in ('submit', 'image'):
+            self._submit_form(form, element)
+
+    def type_text(self, element, text):
+        self._values[id(element)] = self._values.get(id(element), '') + text
+
+    def select_option(self, element):
+        options = element.find_all('option')
+        if not options:
+            return None
+        option = random.choice(options[1:])  # Skip first (usually placeholder)
+        self._values[id(element)] = option.get('value', option.get_text(strip=True))
+        return option.get_text(strip=True)
+
+    def get_attribute(self, element, name):
+        if name == 'type':
+            return self._element_type(element)
+        if name == 'value':
+            return self._values.get(id(element), element.get('value'))
+        return element.get(name)
+
+    def page_text(self):
+        return self.soup.get_text(' ', strip=True) if self.soup is not None else ''
+
+    def match_terms(self, terms, key):
+        # The document only changes on navigation, so its text is lowercased once
+        if self._lower_text is None:
+            self._lower_text = self.page_text().lower()
+        return {i for i, term in enumerate(terms) if term in self._lower_text}
+
+    def wait_for_settle(self):
+        # Nothing renders asynchronously without JavaScript
+        return 0.0
+
+    def wait_after_scroll(self):
+        return 0.0
+
+    def network_usage(self):
+        # Only documents are fetched, so there are no subresources to block or cache
+        return {
+            'bytes_transferred': self.bytes_transferred,
+            'requests': self.round_trips,
+            'blocked_requests': 0,
+            'cached_requests': 0
+        }
+
+    def close(self, healthy=True):
+        self.session.close()
+
+    def _submit_form(self, form, submitter):
+        fields = []
+        for field in form.find_all(['input', 'select', 'textarea']):
+            name = field.get('name')
+            if not name or field.has_attr('disabled'):
+                continue
+
+            field_type = self._element_type(field)
+            if field_type in ('submit', 'button', 'image', 'reset', 'file'):
+                continue
+            if field_type in ('checkbox', 'radio') and not field.has_attr('checked'):
+                continue
+
+            if id(field) in self._values:
+                value = self._values[id(field)]
+            elif field.name == 'select':
+                selected = field.find('option', selected=True) or field.find('option')
+                value = selected.get('value', selected.get_text(strip=True)) if selected else ''
+            elif field.name == 'textarea':
+                value = field.get_text()
+            else:
+                value = field.get('value', 'on' if field_type in ('checkbox', 'radio') else '')
+            fields.append((name, value))
+
+        if submitter.get('name'):
+            fields.append((submitter['name'], submitter.get('value', '')))
+
+        action = urljoin(self.url, form.get('action') or self.url)
+        method = (form.get('method') or 'GET').upper()
+        self.navigate(action, method=method, data=fields)
+
+    def _element_type(self, tag):
+        """Mirror the DOM `type` property defaults"""
+        if tag.name == 'input':
+            return (tag.get('type') or 'text').lower()
+        if tag.name == 'button':
+            return (tag.get('type') or 'submit').lower()
+        if tag.name == 'select':
+            return 'select-multiple' if tag.has_attr('multiple') else 'select-one'
+        if tag.name == 'textarea':
+            return 'textarea'
+        return tag.get('type')
+
+    def _is_hidden(self, tag):
+        if tag.has_attr('disabled'):
+            return True
+        if tag.name == 'input' and (tag.get('type') or '').lower() == 'hidden':
+            return True
+        for node in [tag, *tag.parents]:
+            if node.name == '[document]':
+                break
+            style = (node.get('style') or '').replace(' ', '').lower()
+            if node.has_attr('hidden') or 'display:none' in style or 'visibility:hidden' in style:
+                return True
+        return False
@@ -0,0 +1,111 @@
+import json
+import threading
+
+
+class _Stream:
+    def __init__(self):
+        self.events = []  # (event type, data) in publication order; the index is the offset
+        self.done = False
+        self.condition = threading.Condition()
+
+
+class SimulationEventBus:
+    """In-process, per-simulation event logs that live subscribers can follow and resume.
+
+    Events are appended under a short lock, so publishing costs the simulation almost nothing.
+    A stream is dropped as soon as it closes: subscribers already attached drain it, and later
+    ones replay the finished simulation from its stored results (see replay_events).
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def open(self, simulation_id):
+        with self._lock:
+            self._streams[simulation_id] = _Stream()
+
+    def publish(self, simulation_id, event_type, data):
+        stream = self._streams.get(simulation_id)
+        if stream is None:
+            return
+        with stream.condition:
+            stream.events.append((event_type, data))
+            stream.condition.notify_all()
+
+    def close(self, simulation_id, event_type='end', data=None):
+        """Publish a final event and wake every subscriber"""
+        stream = self._streams.get(simulation_id)
+        if stream is None:
+            return
+        with stream.condition:
+            stream.events.append((event_type, data or {}))
+            stream.done = True
+            stream.condition.notify_all()
+
+        with self._lock:
+            if self._streams.get(simulation_id) is stream:
+                del self._streams[simulation_id]
+
+    def has_stream(self, simulation_id):
+        return simulation_id in self._streams
+
+    def subscribe(self, simulation_id, offset=0, keepalive=15):
+        """Yield (offset, event type, data) from `offset` on, and None every `keepalive` seconds of silence.
+
+        Ends after the stream's final event; yields nothing if the stream is unknown or already closed.
+        """
+        stream = self._streams.get(simulation_id)
+        if stream is None:
+            return
+
+        while True:
+            with stream.condition:
+                if offset >= len(stream.events) and not stream.done:
+                    stream.condition.wait(keepalive)
+                pending = stream.events[offset:]
+                done = stream.done
+
+            if not pending and not done:
+                yield None
+            for event_type, data in pending:
+                yield offset, event_type, data
+                offset += 1
+            if done and offset >= len(stream.events):
+                return
+
+
+def format_sse(event_id, event_type, data):
+    """Render one Server-Sent Events message"""
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+
+def replay_events(results):
+    """Rebuild a finished simulation's event sequence, in live order, from its stored results"""
+    analytics = results.get('analytics', {})
+    friction = sorted(
+        [dict(event, kind='confusion_click') for event in analytics.get('confusion_clicks', [])] +
+        [dict(event, kind='bounce') for event in analytics.get('bounce_points', [])],
+        key=lambda event: event['timestamp']
+    )
+    sources = {
+        'status': iter([{'status': 'running', 'engine': results.get('engine')}]),
+        'action': iter(results.get('actions', [])),
+        'heatmap': iter(results.get('heatmap_data', [])),
+        'friction': iter(friction)
+    }
+    # A failed run stores no actions or points; its events keep their ids with empty data
+    events = [(event_type, next(sources[event_type], {})) for event_type in results.get('event_order', [])]
+    events.append(('end', end_event_data(results)))
+    return events
+
+
+def end_event_data(results):
+    """Summary carried by the final event; the full results stay at GET /api/simulations/<id>"""
+    if results.get('error'):
+        return {'status': 'failed', 'error': results['error']}
+    return {
+        'status': 'completed',
+        'success': results.get('success', False),
+        'analytics': results.get('analytics', {})
+    }
@@ -0,0 +1,89 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from action_log import close_results
+
+logger = logging.getLogger(__name__)
+
+
+def materialize_analytics(analytics_engine, simulation_id, results):
+    """Store analytics for freshly completed results; on failure they are computed on first read"""
+    if analytics_engine is None:
+        return
+    try:
+        analytics_engine.materialize(simulation_id, results)
+    except Exception:
+        logger.exception('Could not materialize analytics for simulation %s', simulation_id)
+
+
+def persist_outcome(simulation_manager, analytics_engine, simulation_id, results, error):
+    """Store a finished simulation's results or error, then close the results' action log.
+
+    A failure to store (e.g. a locked database) is logged and the simulation is marked failed
+    on a best-effort basis, so it never stays 'running' with nobody left to finish it.
+    """
+    try:
+        if error:
+            simulation_manager.mark_simulation_failed(simulation_id, error, results)
+        else:
+            simulation_manager.update_simulation_results(simulation_id, results)
+            materialize_analytics(analytics_engine, simulation_id, results)
+    except Exception as e:
+        logger.exception('Could not store the outcome of simulation %s', simulation_id)
+        try:
+            simulation_manager.mark_simulation_failed(simulation_id, f'Could not store results: {e}')
+        except Exception:
+            logger.exception('Could not mark simulation %s as failed', simulation_id)
+    finally:
+        if results:
+            close_results(results)
+
+
+class SimulationExecutor:
+    """Runs simulations on a bounded in-process worker pool"""
+
+    def __init__(self, behavior_simulator, simulation_manager, max_workers=2, analytics_engine=None):
+        self.behavior_simulator = behavior_simulator
+        self.simulation_manager = simulation_manager
+        self.analytics_engine = analytics_engine
+        self.max_workers = max_workers
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='simulation')
+        self._lock = threading.Lock()
+        self._pending = {}  # simulation_id -> Future
+
+        atexit.register(self.shutdown)
+
+    def submit(self, simulation_id, config):
+        """Queue a simulation that has already been stored with status 'queued'"""
+        future = self._pool.submit(self._run, simulation_id, config)
+        with self._lock:
+            self._pending[simulation_id] = future
+        future.add_done_callback(lambda _: self._forget(simulation_id))
+        return future
+
+    def queue_depth(self):
+        """Number of simulations submitted but not yet finished"""
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self, wait=False):
+        """Stop accepting work; queued simulations that never started stay 'queued'"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, simulation_id, config):
+        """Run one simulation and persist its status transitions"""
+        try:
+            self.simulation_manager.update_simulation_status(simulation_id, 'running')
+            results = self.behavior_simulator.run_simulation(simulation_id, config)
+            error = results.get('error')
+        except Exception as e:
+            results, error = None, str(e)
+
+        persist_outcome(self.simulation_manager, self.analytics_engine, simulation_id, results, error)
+        return results
+
+    def _forget(self, simulation_id):
+        with self._lock:
+            self._pending.pop(simulation_id, None)
@@ -0,0 +1,78 @@
+SUCCESS_INDICATORS = [
+    'success', 'complete', 'thank you', 'confirmation', 'done',
+    'submitted', 'added to cart', 'checkout', 'purchase', 'order'
+]
+
+# Matches lowercased terms against the page without shipping its text back. The first call on a
+# document scans body.innerText and installs a MutationObserver; later calls only scan elements
+# whose text changed since the previous call, or whose class, style, hidden or open attribute did
+# (innerText skips hidden text, so a revealed message is matched by rescanning that subtree).
+# Returns the indices of terms seen on this document.
+MATCH_TERMS_SCRIPT = """
+const terms = arguments[0], key = arguments[1];
+let state = window.__simGoal;
+if (!state || state.key !== key) {
+    state = window.__simGoal = {key: key, found: new Set(), dirty: new Set(), scanned: false};
+    new MutationObserver(records => {
+        for (const record of records) {
+            if (record.type === 'characterData') {
+                state.dirty.add(record.target.parentElement);
+            } else if (record.type === 'attributes') {
+                state.dirty.add(record.target);
+            } else {
+                for (const node of record.addedNodes) {
+                    state.dirty.add(node.nodeType === Node.TEXT_NODE ? node.parentElement : node);
+                }
+            }
+        }
+    }).observe(document, {
+        childList: true, subtree: true, characterData: true,
+        attributes: true, attributeFilter: ['class', 'style', 'hidden', 'open']
+    });
+}
+const scan = (text) => {
+    text = text.toLowerCase();
+    for (let i = 0; i < terms.length; i++) {
+        if (!state.found.has(i) && text.includes(terms[i])) state.found.add(i);
+    }
+};
+if (!state.scanned) {
+    scan(document.body ? document.body.innerText : '');
+    state.scanned = true;
+} else {
+    for (const el of state.dirty) {
+        if (!el || !el.isConnected || el.nodeType !== Node.ELEMENT_NODE) continue;
+        if (el.checkVisibility && !el.checkVisibility()) continue;
+        scan(el.innerText || '');
+    }
+}
+state.dirty.clear();
+return Array.from(state.found);
+"""
+
+
+class IncrementalGoalChecker:
+    """Checks success indicators and goal keywords, scanning only text changed since the last check"""
+
+    def __init__(self, goal, indicators=None):
+        self.goal_keywords = goal.lower().split()
+        self.indicators = list(SUCCESS_INDICATORS if indicators is None else indicators)
+
+        # Distinct terms pushed into the page; indicators first
+        self.terms = list(dict.fromkeys(self.indicators + self.goal_keywords))
+        self.indicator_count = len(dict.fromkeys(self.indicators))
+        term_index = {term: i for i, term in enumerate(self.terms)}
+        self.goal_columns = [term_index[keyword] for keyword in self.goal_keywords]
+        self.key = '\x1f'.join(self.terms)
+
+    def check(self, driver):
+        """Whether the goal appears to be completed on the current page"""
+        found = driver.match_terms(self.terms, self.key)
+
+        # Any success indicator completes the goal
+        if any(i < self.indicator_count for i in found):
+            return True
+
+        # Otherwise require at least half of the goal keywords
+        keyword_matches = sum(1 for column in self.goal_columns if column in found)
+        return keyword_matches >= len(self.goal_keywords) // 2
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from io import BytesIO
+from PIL import Image
+
+# Density grids are normalized to the viewport: columns span its width and rows are
+# measured in screen heights, so desktop and mobile runs land on the same grid
+GRID_COLUMNS = 64
+GRID_ROWS_PER_SCREEN = 36
+GRID_SCREENS = 8
+GRID_ROWS = GRID_ROWS_PER_SCREEN * GRID_SCREENS
+# Largest rendered image side, in pixels
+MAX_IMAGE_SIDE = 4096
+
+
+HEATMAP_POINT_DTYPE = np.dtype([('x', np.float64), ('y', np.float64), ('intensity', np.float64)])
+
+
+def heatmap_arrays(points):
+    """Coordinate and intensity arrays (x, y, intensity) from heatmap point dicts.
+
+    Reads the points in a single pass, so an action-log view is streamed straight into the
+    arrays rather than copied into a list first.
+    """
+    count = len(points) if hasattr(points, '__len__') else -1
+    rows = np.fromiter(((p['x'], p['y'], p['intensity']) for p in points), dtype=HEATMAP_POINT_DTYPE, count=count)
+    return (np.ascontiguousarray(rows['x']), np.ascontiguousarray(rows['y']),
+            np.ascontiguousarray(rows['intensity']))
+
+
+def cluster_heatmap_grid(x, y, intensity, cell_size=100, min_points=2):
+    """Group heatmap points into zones by bucketing them on a square grid.
+
+    Every point falls in exactly one `cell_size` cell, so zones do not depend on input order,
+    and the work is a sort plus a few bincounts over the coordinate arrays. Cells with at
+    least `min_points` points become zones, largest first.
+    """
+    if len(x) < min_points:
+        return []
+
+    cells_x = np.floor_divide(x, cell_size).astype(np.int64)
+    cells_y = np.floor_divide(y, cell_size).astype(np.int64)
+    cells_x -= cells_x.min()
+    cells_y -= cells_y.min()
+    # One integer key per cell (row-major), so grouping is a 1-D unique
+    keys, inverse = np.unique(cells_y * (cells_x.max() + 1) + cells_x, return_inverse=True)
+
+    counts = np.bincount(inverse, minlength=len(keys))
+    center_x = np.bincount(inverse, weights=x, minlength=len(keys)) / counts
+    center_y = np.bincount(inverse, weights=y, minlength=len(keys)) / counts
+    mean_intensity = np.bincount(inverse, weights=intensity, minlength=len(keys)) / counts
+
+    zone_cells = np.flatnonzero(counts >= min_points)
+    # Largest first; ties broken by grid position so the ordering is stable too
+    zone_cells = zone_cells[np.lexsort((keys[zone_cells], -counts[zone_cells]))]
+
+    return [
+        {
+            'center': {'x': float(center_x[i]), 'y': float(center_y[i])},
+            'points': int(counts[i]),
+            'intensity': float(mean_intensity[i]),
+            'hotness': 'high' if mean_intensity[i] > 0.7 else 'medium'
+        }
+        for i in zone_cells
+    ]
+
+
+def density_grid(x, y, intensity, viewport):
+    """Intensity-weighted GRID_ROWS x GRID_COLUMNS density grid; points below the last screen land in the last row"""
+    width, height = viewport
+    columns = np.clip((x * (GRID_COLUMNS / width)).astype(np.int64), 0, GRID_COLUMNS - 1)
+    rows = np.clip((y * (GRID_ROWS_PER_SCREEN / height)).astype(np.int64), 0, GRID_ROWS - 1)
+    grid = np.bincount(rows * GRID_COLUMNS + columns, weights=intensity, minlength=GRID_ROWS * GRID_COLUMNS)
+    return grid.reshape(GRID_ROWS, GRID_COLUMNS).astype(np.float32)
+
+
+def encode_grid(grid):
+    # Mostly-empty grids compress to a few hundred bytes
+    return zlib.compress(np.ascontiguousarray(grid, dtype='<f4').tobytes())
+
+
+def decode_grid(blob, rows=GRID_ROWS, columns=GRID_COLUMNS):
+    return np.frombuffer(zlib.decompress(blob), dtype='<f4').reshape(rows, columns)
+
+
+# Bump when the rendering changes so cached images are not reused
+RENDER_VERSION = 1
+
+# Transparent -> blue -> cyan -> green -> yellow -> red, as (position, r, g, b, alpha)
+COLOR_STOPS = [(0.0, 0, 0, 255, 0), (0.2, 0, 0, 255, 120), (0.4, 0, 255, 255, 160),
+               (0.6, 0, 255, 0, 190), (0.8, 255, 255, 0, 215), (1.0, 255, 0, 0, 240)]
+COLOR_LUT = np.stack([
+    np.interp(np.linspace(0, 1, 256), [stop[0] for stop in COLOR_STOPS], [stop[channel] for stop in COLOR_STOPS])
+    for channel in range(1, 5)
+], axis=1).astype(np.uint8)
+
+
+def _blur(grid, radius=1):
+    """Separable box blur from cumulative sums, applied twice (close to a small Gaussian)"""
+    size = 2 * radius + 1
+    for _ in range(2):
+        for axis in (0, 1):
+            padded = np.pad(grid, [(radius + 1, radius) if a == axis else (0, 0) for a in (0, 1)])
+            sums = np.cumsum(padded, axis=axis)
+            grid = (np.take(sums, np.arange(size, sums.shape[axis]), axis=axis) -
+                    np.take(sums, np.arange(0, sums.shape[axis] - size), axis=axis)) / size
+    return grid
+
+
+def render_heatmap_png(grid, width=None, height=None, overlay=False, screens=None):
+    """Render a density grid as PNG bytes.
+
+    Only the first `screens` screen heights are drawn (default: down to the last non-empty one),
+    at most GRID_SCREENS. The default height is capped at MAX_IMAGE_SIDE.
+    `overlay` leaves empty areas transparent for layering over a page screenshot; otherwise
+    the heatmap is drawn on a dark background.
+    """
+    rows_used = np.flatnonzero(grid.any(axis=1))
+    if screens is None:
+        screens = max(1, -(-(rows_used[-1] + 1) // GRID_ROWS_PER_SCREEN)) if len(rows_used) else 1
+    screens = min(max(screens, 1), GRID_SCREENS)
+    grid = np.asarray(grid[:screens * GRID_ROWS_PER_SCREEN], dtype=np.float64)
+
+    density = _blur(grid)
+    peak = density.max()
+    levels = (np.sqrt(density / peak) * 255).astype(np.uint8) if peak > 0 else np.zeros(density.shape, np.uint8)
+    image = Image.fromarray(COLOR_LUT[levels], 'RGBA')
+
+    # Default to a 16:9 screen per 36 rows at 480px wide
+    width = int(width or 480)
+    height = int(height or min(round(width * 9 / 16 * screens), MAX_IMAGE_SIDE))
+    image = image.resize((width, height), Image.BILINEAR)
+    if not overlay:
+        background = Image.new('RGBA', image.size, (17, 24, 39, 255))
+        image = Image.alpha_composite(background, image)
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class HeatmapImageCache:
+    """LRU cache of rendered heatmap PNGs keyed by a hash of the density data and render options"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source, **options):
+        """Content hash of the grid bytes (or another fingerprint) plus render options"""
+        digest = hashlib.sha1(source if isinstance(source, bytes) else str(source).encode('utf-8'))
+        digest.update(json.dumps(dict(options, version=RENDER_VERSION), sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
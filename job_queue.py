@@ -0,0 +1,220 @@
+import sqlite3
+import json
+import time
+
+
+class SimulationQueue:
+    """Durable simulation job queue with worker leases, stored next to the simulations table"""
+
+    def __init__(self, db_path='simulator.db', lease_seconds=60, max_attempts=3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _connect(self):
+        # Autocommit mode so claims can take an explicit write lock with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def init_db(self):
+        """Initialize the simulation_jobs table"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS simulation_jobs (
+                simulation_id TEXT PRIMARY KEY,
+                config TEXT NOT NULL,  -- JSON string
+                status TEXT DEFAULT 'queued',  -- queued, leased, done, dead
+                attempts INTEGER DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                heartbeat_at REAL,
+                last_error TEXT,
+                enqueued_at REAL NOT NULL,
+                batch_id TEXT,
+                max_parallel INTEGER  -- cap on leased jobs of the same batch
+            )
+        ''')
+        # Queues created before batches were enqueued durably lack the batch columns
+        cursor.execute('PRAGMA table_info(simulation_jobs)')
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'batch_id' not in columns:
+            cursor.execute('ALTER TABLE simulation_jobs ADD COLUMN batch_id TEXT')
+            cursor.execute('ALTER TABLE simulation_jobs ADD COLUMN max_parallel INTEGER')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulation_jobs_claim
+            ON simulation_jobs (status, lease_expires_at, enqueued_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_simulation_jobs_batch
+            ON simulation_jobs (batch_id, status, lease_expires_at)
+        ''')
+
+        conn.close()
+
+    def enqueue(self, simulation_id, config):
+        """Add a simulation to the queue"""
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR IGNORE INTO simulation_jobs (simulation_id, config, enqueued_at)
+            VALUES (?, ?, ?)
+        ''', (simulation_id, json.dumps(config), time.time()))
+        conn.close()
+        return simulation_id
+
+    # Same interface as SimulationExecutor so the app can use either
+    submit = enqueue
+
+    def enqueue_many(self, simulations, batch_id=None, max_parallel=None):
+        """Add (simulation_id, config) pairs in one transaction.
+
+        With max_parallel, at most that many jobs of the batch are leased at once.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('''
+                INSERT OR IGNORE INTO simulation_jobs (simulation_id, config, enqueued_at, batch_id, max_parallel)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(simulation_id, json.dumps(config), now, batch_id, max_parallel)
+                  for simulation_id, config in simulations])
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return [simulation_id for simulation_id, _ in simulations]
+
+    def lease(self, worker_id):
+        """Claim the oldest available job, including ones whose lease has expired.
+
+        Jobs of a batch that already has max_parallel live leases are skipped.
+        """
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT simulation_id, config, attempts FROM simulation_jobs AS job
+                WHERE (status = 'queued' OR (status = 'leased' AND lease_expires_at < ?))
+                  AND attempts < ?
+                  AND (max_parallel IS NULL OR (
+                      SELECT COUNT(*) FROM simulation_jobs AS running
+                      WHERE running.batch_id = job.batch_id AND running.status = 'leased'
+                        AND running.lease_expires_at >= ?
+                  ) < max_parallel)
+                ORDER BY enqueued_at
+                LIMIT 1
+            ''', (now, self.max_attempts, now))
+            row = cursor.fetchone()
+
+            if not row:
+                cursor.execute('COMMIT')
+                return None
+
+            cursor.execute('''
+                UPDATE simulation_jobs
+                SET status = 'leased', attempts = attempts + 1, lease_owner = ?,
+                    lease_expires_at = ?, heartbeat_at = ?
+                WHERE simulation_id = ?
+            ''', (worker_id, now + self.lease_seconds, now, row[0]))
+            cursor.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        return {
+            'simulation_id': row[0],
+            'config': json.loads(row[1]),
+            'attempt': row[2] + 1
+        }
+
+    def heartbeat(self, simulation_id, worker_id):
+        """Extend a lease; returns False if the worker no longer owns the job"""
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute('''
+            UPDATE simulation_jobs SET lease_expires_at = ?, heartbeat_at = ?
+            WHERE simulation_id = ? AND lease_owner = ? AND status = 'leased'
+        ''', (now + self.lease_seconds, now, simulation_id, worker_id))
+        owned = cursor.rowcount > 0
+        conn.close()
+        return owned
+
+    def complete(self, simulation_id, worker_id, error=None):
+        """Finish a leased job; returns False if the lease was lost to another worker"""
+        conn = self._connect()
+        cursor = conn.execute('''
+            UPDATE simulation_jobs SET status = 'done', lease_expires_at = NULL, last_error = ?
+            WHERE simulation_id = ? AND lease_owner = ? AND status = 'leased'
+        ''', (error, simulation_id, worker_id))
+        owned = cursor.rowcount > 0
+        conn.close()
+        return owned
+
+    def reap_dead_jobs(self):
+        """Give up on expired jobs that used every attempt; returns their simulation ids"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT simulation_id FROM simulation_jobs
+                WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            ''', (time.time(), self.max_attempts))
+            dead = [row[0] for row in cursor.fetchall()]
+
+            for simulation_id in dead:
+                cursor.execute('''
+                    UPDATE simulation_jobs
+                    SET status = 'dead', lease_expires_at = NULL, last_error = 'lease expired'
+                    WHERE simulation_id = ?
+                ''', (simulation_id,))
+            cursor.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        return dead
+
+    def queue_depth(self):
+        """Number of jobs waiting for or held by a worker"""
+        conn = self._connect()
+        cursor = conn.execute("SELECT COUNT(*) FROM simulation_jobs WHERE status IN ('queued', 'leased')")
+        depth = cursor.fetchone()[0]
+        conn.close()
+        return depth
+
+    def get_job(self, simulation_id):
+        """Get queue bookkeeping for a simulation"""
+        conn = self._connect()
+        cursor = conn.execute('''
+            SELECT simulation_id, status, attempts, lease_owner, lease_expires_at, heartbeat_at, last_error
+            FROM simulation_jobs WHERE simulation_id = ?
+        ''', (simulation_id,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if row:
+            return {
+                'simulation_id': row[0],
+                'status': row[1],
+                'attempts': row[2],
+                'lease_owner': row[3],
+                'lease_expires_at': row[4],
+                'heartbeat_at': row[5],
+                'last_error': row[6]
+            }
+        return None
@@ -0,0 +1,230 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}'
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Point-in-time value; either set directly or read from a callback at collection time"""
+
+    type = 'gauge'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, function):
+        """Callback returning a number, or a dict of {labels dict as tuple of pairs: value}"""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return []
+            if isinstance(value, dict):
+                return [(self.name, key, v) for key, v in value.items()]
+            return [(self.name, (), value)]
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        """Context manager (or decorator) observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', key + (('le', bound),), cumulative))
+            samples.append((f'{self.name}_count', key, cumulative))
+            samples.append((f'{self.name}_sum', key, series[-1]))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered as Prometheus text or JSON"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            return metric
+
+    def counter(self, name, description):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description):
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def to_prometheus(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, key, value in metric.samples():
+                lines.append(f'{name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        return {
+            metric.name: {
+                'type': metric.type,
+                'description': metric.description,
+                'samples': [
+                    {'name': name, 'labels': {k: str(v) for k, v in key}, 'value': value}
+                    for name, key, value in metric.samples()
+                ]
+            }
+            for metric in list(self._metrics.values())
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port, host='0.0.0.0', registry=REGISTRY):
+    """Serve `registry` at http://host:port/metrics (?format=json for JSON) from a daemon thread.
+
+    For processes without the Flask app, e.g. queue workers; returns the server.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path != '/metrics':
+                self.send_error(404)
+                return
+            if parse_qs(parsed.query).get('format') == ['json']:
+                body, content_type = json.dumps(registry.to_dict()), 'application/json'
+            else:
+                body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+# Shared by every module that touches the database
+DB_QUERY_SECONDS = REGISTRY.histogram('simulator_db_query_seconds', 'SQLite operation latency by manager and operation')
+
+
+def timed_db_operation(method):
+    """Observe a manager method's duration as a SQLite operation latency"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with DB_QUERY_SECONDS.time(manager=type(self).__name__, operation=method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,117 @@
+import json
+from selenium.common.exceptions import WebDriverException
+
+
+# Chrome's Network.setBlockedURLs takes wildcard URL patterns only, so resource types are
+# blocked by the file extensions that carry them. Patterns match anywhere in a URL ('*.mov'
+# also matches www.movado.com) and apply to the page itself, so patterns that match the
+# simulated page are dropped for that run (see blocked_url_patterns).
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.ogg', '*.mp3', '*.wav', '*.m4a', '*.mov', '*.m3u8'],
+    'stylesheet': ['*.css']
+}
+
+TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*segment.io*',
+    '*cdn.segment.com*', '*mixpanel.com*', '*amplitude.com*', '*fullstory.com*',
+    '*clarity.ms*', '*intercom.io*', '*newrelic.com*', '*nr-data.net*'
+]
+
+# 'full' loads everything like a real visitor; 'lean' keeps styles (layout stays faithful)
+# but drops media, fonts and trackers; 'dom' also drops stylesheets
+NETWORK_PROFILES = {
+    'full': {'block_types': [], 'block_urls': [], 'cache': True},
+    'no-trackers': {'block_types': [], 'block_urls': TRACKER_PATTERNS, 'cache': True},
+    'lean': {'block_types': ['image', 'font', 'media'], 'block_urls': TRACKER_PATTERNS, 'cache': True},
+    'dom': {'block_types': ['image', 'font', 'media', 'stylesheet'], 'block_urls': TRACKER_PATTERNS, 'cache': True}
+}
+
+
+def resolve_network_profile(config):
+    """Get the simulation's network profile as {'name', 'block_types', 'block_urls', 'cache'}.
+
+    `network_profile` is a profile name or a dict of overrides; `block_urls` in the config adds
+    extra URL patterns to whichever profile is chosen.
+    """
+    requested = config.get('network_profile') or 'full'
+    if isinstance(requested, dict):
+        base = NETWORK_PROFILES.get(requested.get('base', 'full'), NETWORK_PROFILES['full'])
+        profile = dict(base, **{k: v for k, v in requested.items() if k != 'base'})
+        profile.setdefault('name', 'custom')
+    else:
+        if requested not in NETWORK_PROFILES:
+            raise ValueError(f'Unknown network profile: {requested}')
+        profile = dict(NETWORK_PROFILES[requested], name=requested)
+
+    unknown = [t for t in profile['block_types'] if t not in RESOURCE_TYPE_PATTERNS]
+    if unknown:
+        raise ValueError(f'Unknown resource types: {", ".join(unknown)}')
+
+    profile['block_urls'] = list(profile['block_urls']) + list(config.get('block_urls', []))
+    return profile
+
+
+def url_pattern_matches(url, pattern):
+    """Whether Chrome's blocked-URL matching would block `url`: the pieces between '*' appear in order"""
+    position = 0
+    for part in pattern.split('*'):
+        position = url.find(part, position)
+        if position < 0:
+            return False
+        position += len(part)
+    return True
+
+
+def blocked_url_patterns(profile, page_url=None):
+    """The profile's URL patterns, without any that would block `page_url` itself"""
+    patterns = [p for t in profile['block_types'] for p in RESOURCE_TYPE_PATTERNS[t]] + list(profile['block_urls'])
+    if page_url:
+        patterns = [p for p in patterns if not url_pattern_matches(page_url, p)]
+    return patterns
+
+
+def apply_network_profile(webdriver, profile, page_url=None):
+    """Apply blocking and cache settings to a (possibly reused) browser session about to load `page_url`"""
+    webdriver.execute_cdp_cmd('Network.enable', {})
+    webdriver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_url_patterns(profile, page_url)})
+    webdriver.execute_cdp_cmd('Network.setCacheDisabled', {'cacheDisabled': not profile['cache']})
+
+
+class NetworkUsage:
+    """Tallies bytes and requests from Chrome's performance log (Network.* events)"""
+
+    def __init__(self):
+        self.bytes_transferred = 0
+        self.requests = 0
+        self.blocked = 0
+        self.cached = 0
+
+    def drain(self, webdriver):
+        """Consume pending log entries; entries from before a run are drained and discarded first"""
+        try:
+            entries = webdriver.get_log('performance')
+        except (WebDriverException, ValueError):
+            return self
+
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method, params = message['method'], message.get('params', {})
+            if method == 'Network.loadingFinished':
+                self.requests += 1
+                self.bytes_transferred += int(params.get('encodedDataLength', 0))
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                self.blocked += 1
+            elif method == 'Network.requestServedFromCache':
+                self.cached += 1
+        return self
+
+    def to_dict(self):
+        return {
+            'bytes_transferred': self.bytes_transferred,
+            'requests': self.requests,
+            'blocked_requests': self.blocked,
+            'cached_requests': self.cached
+        }
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class PageStructureCache:
+    """LRU cache of interactive-element inventories keyed by URL and DOM fingerprint.
+
+    An optional on-disk tier (one JSON file per page) lets separate worker processes
+    share extracted structure.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, url, fingerprint):
+        """Get the cached structure for a page, or None"""
+        key = self._key(url, fingerprint)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        return entry
+
+    def put(self, url, fingerprint, entry):
+        """Cache the structure extracted from a page"""
+        key = self._key(url, fingerprint)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _key(self, url, fingerprint):
+        return hashlib.sha1(f'{url}\x1f{fingerprint}'.encode('utf-8')).hexdigest()
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(os.path.join(self.disk_dir, f'{key}.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = os.path.join(self.disk_dir, f'{key}.json')
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
@@ -1,37 +1,43 @@
-import sqlite3
 import json
 import uuid
 from datetime import datetime
+from metrics import timed_db_operation
+from database import get_database
 
 class PersonaManager:
     def __init__(self, db_path='simulator.db'):
         self.db_path = db_path
+        self.db = get_database(db_path)
     
+    @timed_db_operation
     def init_db(self):
         """Initialize the personas table"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS personas (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                traits TEXT,  -- JSON string
-                tech_savviness INTEGER,  -- 1-5 scale
-                intent TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insert default personas if none exist
-        cursor.execute('SELECT COUNT(*) FROM personas')
-        if cursor.fetchone()[0] == 0:
-            self._create_default_personas(cursor)
-        
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS personas (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    traits TEXT,  -- JSON string
+                    tech_savviness INTEGER,  -- 1-5 scale
+                    intent TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    scoring_rules TEXT  -- JSON string: trait -> {keywords, weight}
+                )
+            ''')
+            
+            # Databases created before custom scoring rules lack the column
+            cursor.execute('PRAGMA table_info(personas)')
+            if 'scoring_rules' not in [column[1] for column in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE personas ADD COLUMN scoring_rules TEXT')
+            
+            # Insert default personas if none exist
+            cursor.execute('SELECT COUNT(*) FROM personas')
+            if cursor.fetchone()[0] == 0:
+                self._create_default_personas(cursor)
     
     def _create_default_personas(self, cursor):
         """Create default personas for testing"""
@@ -77,29 +83,26 @@ class PersonaManager:
             ''', (persona['id'], persona['name'], persona['description'], 
                   persona['traits'], persona['tech_savviness'], persona['intent']))
     
-    def create_persona(self, name, description, traits, tech_savviness, intent):
+    @timed_db_operation
+    def create_persona(self, name, description, traits, tech_savviness, intent, scoring_rules=None):
         """Create a new persona"""
         persona_id = str(uuid.uuid4())
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO personas (id, name, description, traits, tech_savviness, intent)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (persona_id, name, description, json.dumps(traits), tech_savviness, intent))
+        self.db.execute('''
+            INSERT INTO personas (id, name, description, traits, tech_savviness, intent, scoring_rules)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (persona_id, name, description, json.dumps(traits), tech_savviness, intent,
+              json.dumps(scoring_rules) if scoring_rules else None))
         
-        conn.commit()
-        conn.close()
         return persona_id
     
+    @timed_db_operation
     def get_persona(self, persona_id):
         """Get a specific persona"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM personas WHERE id = ?', (persona_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.db.query_one('''
+            SELECT id, name, description, traits, tech_savviness, intent, created_at, updated_at, scoring_rules
+            FROM personas WHERE id = ?
+        ''', (persona_id,))
         
         if row:
             return {
@@ -110,18 +113,18 @@ class PersonaManager:
                 'tech_savviness': row[4],
                 'intent': row[5],
                 'created_at': row[6],
-                'updated_at': row[7]
+                'updated_at': row[7],
+                'scoring_rules': json.loads(row[8]) if row[8] else {}
             }
         return None
     
+    @timed_db_operation
     def get_all_personas(self):
         """Get all personas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM personas ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self.db.query('''
+            SELECT id, name, description, traits, tech_savviness, intent, created_at, updated_at, scoring_rules
+            FROM personas ORDER BY created_at DESC
+        ''')
         
         personas = []
         for row in rows:
@@ -133,16 +136,15 @@ class PersonaManager:
                 'tech_savviness': row[4],
                 'intent': row[5],
                 'created_at': row[6],
-                'updated_at': row[7]
+                'updated_at': row[7],
+                'scoring_rules': json.loads(row[8]) if row[8] else {}
             })
         
         return personas
     
+    @timed_db_operation
     def update_persona(self, persona_id, updates):
         """Update an existing persona"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         update_fields = []
         values = []
         
@@ -151,29 +153,18 @@ class PersonaManager:
                 update_fields.append(f'{field} = ?')
                 values.append(updates[field])
         
-        if 'traits' in updates:
-            update_fields.append('traits = ?')
-            values.append(json.dumps(updates['traits']))
+        for field in ['traits', 'scoring_rules']:
+            if field in updates:
+                update_fields.append(f'{field} = ?')
+                values.append(json.dumps(updates[field]))
         
         update_fields.append('updated_at = CURRENT_TIMESTAMP')
         values.append(persona_id)
         
         query = f'UPDATE personas SET {", ".join(update_fields)} WHERE id = ?'
-        cursor.execute(query, values)
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+        return self.db.execute(query, values).rowcount > 0
     
+    @timed_db_operation
     def delete_persona(self, persona_id):
         """Delete a persona"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM personas WHERE id = ?', (persona_id,))
-        success = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
-        return success
\ No newline at end of file
+        return self.db.execute('DELETE FROM personas WHERE id = ?', (persona_id,)).rowcount > 0
\ No newline at end of file
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+# Trait -> keyword rule. A candidate whose text contains any of the keywords gains the weight.
+# Custom personas can add or override rules through their `scoring_rules` field.
+TRAIT_KEYWORD_RULES = {
+    'price-conscious': {'keywords': ['price', 'cost', 'cheap', 'discount', 'sale'], 'weight': 3},
+    'social-proof-driven': {'keywords': ['review', 'rating', 'testimonial', 'customer'], 'weight': 3},
+    'help-seeking': {'keywords': ['help', 'support', 'faq', 'guide', 'tutorial'], 'weight': 3}
+}
+
+GOAL_KEYWORD_WEIGHT = 5
+BUTTON_BONUS = 2
+COMPLEX_INPUT_PENALTY = -1  # Applied for personas with tech savviness below 3
+
+
+class PersonaScoringModel:
+    """Persona and goal compiled once per simulation into a vectorized element scorer"""
+
+    def __init__(self, persona, goal, rules=None):
+        self.traits = frozenset(persona['traits'])
+        self.tech_savviness = persona['tech_savviness']
+
+        rules = dict(TRAIT_KEYWORD_RULES if rules is None else rules)
+        rules.update(persona.get('scoring_rules') or {})
+
+        # One keyword table shared by goal and trait rules; every distinct keyword is scanned once
+        self.keywords = []
+        keyword_index = {}
+
+        def index_of(keyword):
+            keyword = keyword.lower()
+            if keyword not in keyword_index:
+                keyword_index[keyword] = len(self.keywords)
+                self.keywords.append(keyword)
+            return keyword_index[keyword]
+
+        # Each goal keyword occurrence adds its weight, so repeated words count repeatedly
+        goal_columns = [index_of(keyword) for keyword in goal.lower().split()]
+
+        # Trait rules add their weight once if any of their keywords hit
+        self.rule_columns = []
+        self.rule_weights = []
+        for trait, rule in rules.items():
+            if trait in self.traits and rule.get('keywords'):
+                self.rule_columns.append(np.array([index_of(k) for k in rule['keywords']]))
+                self.rule_weights.append(rule.get('weight', 3))
+
+        self.goal_weights = np.zeros(len(self.keywords))
+        np.add.at(self.goal_weights, goal_columns, GOAL_KEYWORD_WEIGHT)
+        self.rule_weights = np.array(self.rule_weights, dtype=float)
+        self.penalize_complex_inputs = self.tech_savviness < 3
+
+    def score(self, elements):
+        """Score every candidate in one batched pass; returns an array aligned with `elements`"""
+        count = len(elements)
+        if not count:
+            return np.zeros(0)
+
+        # Lowercase in Python: np.char.lower keeps the array's width and truncates text that grows ('İ')
+        texts = np.array([(e['text'] or '').lower() for e in elements], dtype=str)
+        tags = np.array([e['tag'] or '' for e in elements], dtype=str)
+        roles = np.array([e['role'] or '' for e in elements], dtype=str)
+        types = np.array([e['type'] or '' for e in elements], dtype=str)
+
+        # hits[k, i] is True when keyword k appears in candidate i's text
+        hits = np.empty((len(self.keywords), count), dtype=bool)
+        for k, keyword in enumerate(self.keywords):
+            hits[k] = np.char.find(texts, keyword) >= 0
+
+        scores = self.goal_weights @ hits if len(self.keywords) else np.zeros(count)
+        for columns, weight in zip(self.rule_columns, self.rule_weights):
+            scores = scores + weight * hits[columns].any(axis=0)
+
+        # Element type preferences: buttons are naturally appealing
+        is_button = (tags == 'button') | (np.char.find(roles, 'button') >= 0)
+        scores = scores + BUTTON_BONUS * is_button
+
+        # Less tech-savvy users might avoid complex inputs
+        if self.penalize_complex_inputs:
+            complex_input = ((tags == 'select') | (tags == 'input')) & (types != 'submit')
+            scores = scores + COMPLEX_INPUT_PENALTY * complex_input
+
+        return scores
+
+    def choose(self, elements, jitter=0.5):
+        """Index of the best candidate, with a little randomness to break near-ties"""
+        scores = self.score(elements)
+        if not len(scores):
+            return None
+        return int(np.argmax(scores + np.random.uniform(-jitter, jitter, len(scores))))
@@ -0,0 +1,89 @@
+import time
+from selenium.common.exceptions import WebDriverException
+
+
+# Installed on every new document (and lazily if missing). Tracks the last DOM mutation
+# and the number of in-flight fetch/XHR requests.
+SETTLE_INSTRUMENTATION_SCRIPT = """
+(function() {
+    if (window.__simSettle) return;
+    const state = window.__simSettle = {lastMutation: performance.now(), pending: 0};
+    const touch = () => { state.lastMutation = performance.now(); };
+    const observe = () => new MutationObserver(touch).observe(document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    if (document.documentElement) observe(); else document.addEventListener('DOMContentLoaded', observe);
+
+    const track = (promise) => {
+        state.pending++;
+        const settle = () => { state.pending = Math.max(0, state.pending - 1); touch(); };
+        promise.then(settle, settle);
+    };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function() {
+            const request = originalFetch.apply(this, arguments);
+            track(request);
+            return request;
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        track(new Promise(resolve => this.addEventListener('loadend', resolve)));
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+# Waits in-page until the document is complete, no requests are in flight and the DOM has
+# been quiet for the requested period, or the ceiling passes. Resolves with [settled, elapsed_ms].
+WAIT_FOR_SETTLE_SCRIPT = SETTLE_INSTRUMENTATION_SCRIPT + """
+const done = arguments[arguments.length - 1];
+const quietMs = arguments[0], ceilingMs = arguments[1];
+const start = performance.now();
+(function check() {
+    const state = window.__simSettle;
+    const now = performance.now();
+    const settled = document.readyState === 'complete' && state.pending === 0 &&
+        now - state.lastMutation >= quietMs;
+    if (settled || now - start >= ceilingMs) return done([settled, now - start]);
+    setTimeout(check, 25);
+})();
+"""
+
+
+class PageSettleDetector:
+    """Waits for real page signals instead of fixed sleeps"""
+
+    def __init__(self, quiet_period=0.3, max_wait=10.0, scroll_max_wait=1.0):
+        self.quiet_period = quiet_period
+        self.max_wait = max_wait
+        self.scroll_max_wait = scroll_max_wait
+
+    def install(self, driver):
+        """Register the instrumentation so every new document is observed from its first script"""
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': SETTLE_INSTRUMENTATION_SCRIPT})
+        driver.set_script_timeout(self.max_wait + 5)
+
+    def wait(self, driver, max_wait=None, quiet_period=None):
+        """Block until the page settles or the ceiling passes; returns seconds waited"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        quiet_period = self.quiet_period if quiet_period is None else quiet_period
+        start = time.time()
+
+        while True:
+            remaining = max_wait - (time.time() - start)
+            if remaining <= 0:
+                break
+            try:
+                driver.execute_async_script(WAIT_FOR_SETTLE_SCRIPT, quiet_period * 1000, remaining * 1000)
+                break
+            except WebDriverException:
+                # The document navigated away mid-wait; keep waiting on the new one
+                time.sleep(0.05)
+
+        return time.time() - start
+
+    def wait_after_scroll(self, driver):
+        """Short wait for scroll-triggered rendering such as lazy loading"""
+        return self.wait(driver, max_wait=self.scroll_max_wait, quiet_period=min(self.quiet_period, 0.1))
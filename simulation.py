@@ -1,72 +1,417 @@
-import sqlite3
 import json
 import uuid
+import tempfile
 from datetime import datetime
+from metrics import timed_db_operation
+from database import get_database
+from action_log import iter_results_json
+from drivers import DEVICE_PROFILES
+from heatmap import heatmap_arrays, density_grid, encode_grid, decode_grid, GRID_ROWS, GRID_COLUMNS
+import numpy as np
+import base64
+import os
+
+# Fields the simulation listing can project, mapped to their SQL. `results` is the full stored
+# blob and `success` is read out of it, so both are opt-in.
+LIST_FIELDS = {
+    'id': 's.id',
+    'url': 's.url',
+    'persona_id': 's.persona_id',
+    'persona_name': 'p.name',
+    'goal': 's.goal',
+    'duration': 's.duration',
+    'device_type': 's.device_type',
+    'status': 's.status',
+    'created_at': 's.created_at',
+    'completed_at': 's.completed_at',
+    'batch_id': 's.batch_id',
+    'success': "json_extract(CAST(s.results AS TEXT), '$.success')",
+    'results': 's.results'
+}
+DEFAULT_LIST_FIELDS = [field for field in LIST_FIELDS if field not in ('success', 'results')]
+MAX_LIST_LIMIT = 500
+
+# Keys of completed results that live in the normalized tables rather than the results document
+# (unless the full document is archived)
+NORMALIZED_RESULT_KEYS = ('actions', 'heatmap_data')
+NORMALIZED_ANALYTICS_KEYS = {'confusion_click': 'confusion_clicks', 'bounce': 'bounce_points'}
+# Parts of a failed run's results kept with its error
+FAILED_RESULT_KEYS = ('engine', 'spans', 'event_order')
 
 class SimulationManager:
-    def __init__(self, db_path='simulator.db'):
+    def __init__(self, db_path='simulator.db', archive_results=None):
         self.db_path = db_path
+        self.db = get_database(db_path)
+        if archive_results is None:
+            archive_results = os.environ.get('ARCHIVE_RESULTS_JSON', '0').lower() in ('1', 'true', 'yes')
+        self.archive_results = archive_results
     
+    @timed_db_operation
     def init_db(self):
         """Initialize the simulations table"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulations (
+                    id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    persona_id TEXT NOT NULL,
+                    goal TEXT,
+                    duration INTEGER,
+                    device_type TEXT,
+                    status TEXT DEFAULT 'pending',
+                    results TEXT,  -- JSON string
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP,
+                    batch_id TEXT
+                )
+            ''')
+            
+            # Databases created before batches existed lack the batch_id column
+            cursor.execute('PRAGMA table_info(simulations)')
+            if 'batch_id' not in [column[1] for column in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE simulations ADD COLUMN batch_id TEXT')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulations_batch ON simulations (batch_id, status)')
+            # Listing indexes: newest-first keyset pages, optionally narrowed by one equality filter
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulations_created ON simulations (created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulations_status ON simulations (status, created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulations_persona ON simulations (persona_id, created_at, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulations_url ON simulations (url, created_at, id)')
+            
+            # One pre-binned density grid per completed simulation, with the filter columns copied in
+            # so site-level heatmaps never touch the simulations table or raw points
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS heatmap_grids (
+                    simulation_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    persona_id TEXT NOT NULL,
+                    device_type TEXT,
+                    completed_at TIMESTAMP,
+                    grid_rows INTEGER NOT NULL,
+                    grid_columns INTEGER NOT NULL,
+                    point_count INTEGER NOT NULL,
+                    grid BLOB NOT NULL  -- zlib-compressed little-endian float32
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_grids_url ON heatmap_grids (url, completed_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_grids_persona ON heatmap_grids (persona_id, completed_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_grids_completed ON heatmap_grids (completed_at)')
+            
+            # Normalized results, written at completion, so cross-simulation questions are plain SQL
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulation_actions (
+                    simulation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    relative_time REAL NOT NULL,
+                    settle_time REAL,
+                    details TEXT,
+                    PRIMARY KEY (simulation_id, seq)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_actions_type ON simulation_actions (type, simulation_id)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulation_friction (
+                    simulation_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,  -- confusion_click or bounce
+                    seq INTEGER NOT NULL,
+                    timestamp REAL NOT NULL,
+                    relative_time REAL,
+                    reason TEXT,
+                    PRIMARY KEY (simulation_id, kind, seq)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_friction_kind ON simulation_friction (kind, simulation_id)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulation_heatmap_points (
+                    simulation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    x INTEGER NOT NULL,
+                    y INTEGER NOT NULL,
+                    intensity REAL NOT NULL,
+                    duration REAL,
+                    PRIMARY KEY (simulation_id, seq)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulation_metrics (
+                    simulation_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    persona_id TEXT NOT NULL,
+                    goal TEXT,
+                    device_type TEXT,
+                    engine TEXT,
+                    completed_at TIMESTAMP,
+                    success INTEGER NOT NULL,
+                    completion_time REAL,
+                    time_to_first_interaction REAL,
+                    total_interactions INTEGER,
+                    confusion_clicks INTEGER,
+                    bounce_points INTEGER,
+                    heatmap_points INTEGER,
+                    round_trips INTEGER,
+                    bytes_transferred INTEGER
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_metrics_persona ON simulation_metrics (persona_id, url, completed_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_metrics_url ON simulation_metrics (url, completed_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_metrics_completed ON simulation_metrics (completed_at)')
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS simulations (
-                id TEXT PRIMARY KEY,
-                url TEXT NOT NULL,
-                persona_id TEXT NOT NULL,
-                goal TEXT,
-                duration INTEGER,
-                device_type TEXT,
-                status TEXT DEFAULT 'pending',
-                results TEXT,  -- JSON string
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        self.backfill_normalized_results()
+    
+    @timed_db_operation
+    def backfill_normalized_results(self, batch_size=50):
+        """Normalize completed simulations stored before the normalized tables existed; their documents are kept as is"""
+        normalized = 0
+        while True:
+            rows = self.db.query('''
+                SELECT s.id, s.results FROM simulations s
+                WHERE s.status = 'completed' AND s.results IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM simulation_metrics m WHERE m.simulation_id = s.id)
+                LIMIT ?
+            ''', (batch_size,))
+            if not rows:
+                return normalized
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                for simulation_id, results_json in rows:
+                    self._store_normalized(cursor, simulation_id, self._load_results(simulation_id, results_json))
+            normalized += len(rows)
     
+    @timed_db_operation
     def create_simulation(self, simulation_id, config):
         """Create a new simulation record"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        self.db.execute('''
             INSERT INTO simulations (id, url, persona_id, goal, duration, device_type, status)
-            VALUES (?, ?, ?, ?, ?, ?, 'running')
+            VALUES (?, ?, ?, ?, ?, ?, 'queued')
         ''', (simulation_id, config['url'], config['persona_id'], 
               config['goal'], config['duration'], config['device_type']))
         
-        conn.commit()
-        conn.close()
         return simulation_id
     
+    @timed_db_operation
+    def create_simulations(self, simulations, batch_id=None):
+        """Create many simulation records in one transaction from (simulation_id, config) pairs"""
+        with self.db.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO simulations (id, url, persona_id, goal, duration, device_type, status, batch_id)
+                VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)
+            ''', [(simulation_id, config['url'], config['persona_id'], config['goal'],
+                   config['duration'], config['device_type'], batch_id)
+                  for simulation_id, config in simulations])
+        
+        return [simulation_id for simulation_id, _ in simulations]
+    
+    @timed_db_operation
     def update_simulation_results(self, simulation_id, results):
-        """Update simulation with results"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Update simulation with results.
+
+        Actions, friction events, heatmap points and summary metrics go to the normalized tables.
+        The results document keeps everything else (and, with archiving on, the full results);
+        its JSON is encoded in chunks into a spooled buffer and written through incremental
+        blob I/O, so long action logs never become one giant string.
+        """
+        document = results if self.archive_results else _without_normalized(results)
+        with tempfile.SpooledTemporaryFile(max_size=1 << 20) as encoded:
+            for chunk in iter_results_json(document):
+                encoded.write(chunk.encode('utf-8'))
+            size = encoded.tell()
+            encoded.seek(0)
+            
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    UPDATE simulations 
+                    SET results = zeroblob(?), status = 'completed', completed_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (size, simulation_id))
+                cursor.execute('SELECT rowid FROM simulations WHERE id = ?', (simulation_id,))
+                row = cursor.fetchone()
+                if row:
+                    with conn.blobopen('simulations', 'results', row[0]) as blob:
+                        while chunk := encoded.read(1 << 16):
+                            blob.write(chunk)
+                    self._store_heatmap_grid(cursor, simulation_id, results)
+                    self._store_normalized(cursor, simulation_id, results)
+    
+    def _store_normalized(self, cursor, simulation_id, results):
+        """Write the simulation's actions, friction events, heatmap points and metrics rows"""
+        for table in ('simulation_actions', 'simulation_friction', 'simulation_heatmap_points', 'simulation_metrics'):
+            cursor.execute(f'DELETE FROM {table} WHERE simulation_id = ?', (simulation_id,))
+        
+        first = []
+        def action_rows():
+            for seq, action in enumerate(results.get('actions', [])):
+                if not first:
+                    first.append(action['timestamp'] - action.get('relative_time', 0))
+                yield (simulation_id, seq, action['type'], action['timestamp'], action.get('relative_time', 0),
+                       action.get('settle_time'), str(action.get('details', '')))
+        cursor.executemany('''
+            INSERT INTO simulation_actions (simulation_id, seq, type, timestamp, relative_time, settle_time, details)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', action_rows())
+        
+        analytics = results.get('analytics', {})
+        start = first[0] if first else None
+        cursor.executemany('''
+            INSERT INTO simulation_friction (simulation_id, kind, seq, timestamp, relative_time, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(simulation_id, kind, seq, event['timestamp'],
+               event['timestamp'] - start if start is not None else None, event.get('reason'))
+              for kind, key in NORMALIZED_ANALYTICS_KEYS.items()
+              for seq, event in enumerate(analytics.get(key, []))])
         
+        heatmap_points = [0]
+        def heatmap_rows():
+            for seq, point in enumerate(results.get('heatmap_data', [])):
+                heatmap_points[0] = seq + 1
+                yield simulation_id, seq, point['x'], point['y'], point['intensity'], point.get('duration')
+        cursor.executemany('''
+            INSERT INTO simulation_heatmap_points (simulation_id, seq, x, y, intensity, duration)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', heatmap_rows())
+        
+        network = results.get('network', {})
         cursor.execute('''
+            INSERT INTO simulation_metrics
+                (simulation_id, url, persona_id, goal, device_type, engine, completed_at, success, completion_time,
+                 time_to_first_interaction, total_interactions, confusion_clicks, bounce_points, heatmap_points,
+                 round_trips, bytes_transferred)
+            SELECT id, url, persona_id, goal, device_type, ?, completed_at, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            FROM simulations WHERE id = ?
+        ''', (results.get('engine'), 1 if results.get('success') else 0, analytics.get('completion_time'),
+              analytics.get('time_to_first_interaction'), analytics.get('total_interactions'),
+              len(analytics.get('confusion_clicks', [])), len(analytics.get('bounce_points', [])),
+              heatmap_points[0], results.get('performance', {}).get('round_trips'),
+              network.get('bytes_transferred'), simulation_id))
+    
+    def _load_results(self, simulation_id, results_json):
+        """Parse a results document, re-attaching the parts kept in the normalized tables"""
+        if not results_json:
+            return None
+        results = json.loads(results_json)
+        # Completed documents without actions were stored normalized; failures have no analytics
+        if 'analytics' not in results or 'actions' in results:
+            return results
+        
+        actions = []
+        for action_type, details, timestamp, relative_time, settle_time in self.db.query('''
+            SELECT type, details, timestamp, relative_time, settle_time
+            FROM simulation_actions WHERE simulation_id = ? ORDER BY seq
+        ''', (simulation_id,)):
+            action = {'type': action_type, 'details': details, 'timestamp': timestamp, 'relative_time': relative_time}
+            if settle_time is not None:
+                action['settle_time'] = settle_time
+            actions.append(action)
+        results['actions'] = actions
+        
+        results['heatmap_data'] = [
+            {'x': x, 'y': y, 'intensity': intensity, 'duration': duration}
+            for x, y, intensity, duration in self.db.query('''
+                SELECT x, y, intensity, duration FROM simulation_heatmap_points WHERE simulation_id = ? ORDER BY seq
+            ''', (simulation_id,))
+        ]
+        
+        friction = {key: [] for key in NORMALIZED_ANALYTICS_KEYS.values()}
+        for kind, timestamp, reason in self.db.query('''
+            SELECT kind, timestamp, reason FROM simulation_friction WHERE simulation_id = ? ORDER BY kind, seq
+        ''', (simulation_id,)):
+            friction[NORMALIZED_ANALYTICS_KEYS[kind]].append({'timestamp': timestamp, 'reason': reason})
+        results['analytics'].update(friction)
+        return results
+    
+    def _store_heatmap_grid(self, cursor, simulation_id, results):
+        """Bin the simulation's heatmap points into its density grid"""
+        device_type = results.get('config', {}).get('device_type', 'desktop')
+        viewport = DEVICE_PROFILES.get(device_type, DEVICE_PROFILES['desktop'])['viewport']
+        x, y, intensity = heatmap_arrays(results.get('heatmap_data', []))
+        grid = density_grid(x, y, intensity, viewport)
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO heatmap_grids
+                (simulation_id, url, persona_id, device_type, completed_at, grid_rows, grid_columns, point_count, grid)
+            SELECT id, url, persona_id, device_type, completed_at, ?, ?, ?, ?
+            FROM simulations WHERE id = ?
+        ''', (GRID_ROWS, GRID_COLUMNS, len(x), encode_grid(grid), simulation_id))
+    
+    @timed_db_operation
+    def get_heatmap_grid(self, simulation_id):
+        """Get one simulation's density grid as a NumPy array, or None"""
+        row = self.db.query_one('''
+            SELECT grid_rows, grid_columns, grid FROM heatmap_grids WHERE simulation_id = ?
+        ''', (simulation_id,))
+        
+        return decode_grid(row[2], row[0], row[1]) if row else None
+    
+    @timed_db_operation
+    def aggregate_heatmap_grids(self, url=None, persona_id=None, device_type=None, since=None, until=None):
+        """Sum the density grids of every completed simulation matching the filters.
+
+        Dates compare against completed_at ('YYYY-MM-DD HH:MM:SS'); `until` is exclusive.
+        """
+        where, params = self._heatmap_grid_filter(url, persona_id, device_type, since, until)
+        
+        cursor = self.db.execute(f'SELECT grid, point_count FROM heatmap_grids {where}', params)
+        
+        total = np.zeros((GRID_ROWS, GRID_COLUMNS), dtype=np.float64)
+        simulations = points = 0
+        for grid, point_count in cursor:
+            total += decode_grid(grid)
+            simulations += 1
+            points += point_count
+        
+        return {'grid': total, 'simulations': simulations, 'points': points}
+    
+    @timed_db_operation
+    def heatmap_grids_fingerprint(self, url=None, persona_id=None, device_type=None, since=None, until=None):
+        """Cheap summary that changes whenever the set of matching grids changes"""
+        where, params = self._heatmap_grid_filter(url, persona_id, device_type, since, until)
+        
+        return self.db.query_one(f'''
+            SELECT COUNT(*), SUM(point_count), MAX(completed_at), SUM(LENGTH(grid))
+            FROM heatmap_grids {where}
+        ''', params)
+    
+    def _heatmap_grid_filter(self, url, persona_id, device_type, since, until):
+        filters = [('url = ?', url), ('persona_id = ?', persona_id), ('device_type = ?', device_type),
+                   ('completed_at >= ?', since), ('completed_at < ?', until),
+                   ('grid_rows = ?', GRID_ROWS), ('grid_columns = ?', GRID_COLUMNS)]
+        clauses = [clause for clause, value in filters if value is not None]
+        return 'WHERE ' + ' AND '.join(clauses), [value for _, value in filters if value is not None]
+    
+    @timed_db_operation
+    def update_simulation_status(self, simulation_id, status):
+        """Record a status transition (queued, running, completed, failed)"""
+        self.db.execute('UPDATE simulations SET status = ? WHERE id = ?', (status, simulation_id))
+    
+    @timed_db_operation
+    def mark_simulation_failed(self, simulation_id, error, results=None):
+        """Mark a simulation as failed and keep the error message.
+
+        With the failed run's results, its engine, spans and event order are kept as well, so
+        its event stream can be replayed with the ids it was sent live with.
+        """
+        outcome = {'simulation_id': simulation_id, 'error': error, 'success': False}
+        for key in FAILED_RESULT_KEYS:
+            if results and key in results:
+                outcome[key] = results[key]
+        self.db.execute('''
             UPDATE simulations 
-            SET results = ?, status = 'completed', completed_at = CURRENT_TIMESTAMP
+            SET results = ?, status = 'failed', completed_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        ''', (json.dumps(results), simulation_id))
-        
-        conn.commit()
-        conn.close()
+        ''', (json.dumps(outcome), simulation_id))
     
+    @timed_db_operation
     def get_simulation(self, simulation_id):
         """Get a specific simulation"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM simulations WHERE id = ?', (simulation_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.db.query_one('''
+            SELECT id, url, persona_id, goal, duration, device_type, status,
+                   results, created_at, completed_at, batch_id
+            FROM simulations WHERE id = ?
+        ''', (simulation_id,))
         
         if row:
             return {
@@ -77,40 +422,99 @@ class SimulationManager:
                 'duration': row[4],
                 'device_type': row[5],
                 'status': row[6],
-                'results': json.loads(row[7]) if row[7] else None,
+                'results': self._load_results(row[0], row[7]),
                 'created_at': row[8],
-                'completed_at': row[9]
+                'completed_at': row[9],
+                'batch_id': row[10]
             }
         return None
     
-    def get_all_simulations(self):
-        """Get all simulations"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    @timed_db_operation
+    def list_simulations(self, limit=50, cursor=None, fields=None, status=None, persona_id=None, url=None,
+                         since=None, until=None):
+        """One newest-first page of simulations and the cursor for the next page (None on the last).
+
+        Pages are keyed on (created_at, id), so each page is an index range scan however deep
+        it is. `fields` picks the columns returned (DEFAULT_LIST_FIELDS when omitted); dates
+        compare against created_at and `until` is exclusive. Raises ValueError on unknown
+        fields or a malformed cursor.
+        """
+        fields = list(fields or DEFAULT_LIST_FIELDS)
+        unknown = [field for field in fields if field not in LIST_FIELDS]
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+        limit = max(1, min(int(limit), MAX_LIST_LIMIT))
         
-        cursor.execute('''
-            SELECT s.*, p.name as persona_name 
-            FROM simulations s 
-            LEFT JOIN personas p ON s.persona_id = p.id 
-            ORDER BY s.created_at DESC
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
+        clauses, params = self._list_filter(status, persona_id, url, since, until)
+        if cursor:
+            clauses.append('(s.created_at, s.id) < (?, ?)')
+            params.extend(decode_list_cursor(cursor))
         
+        join = 'LEFT JOIN personas p ON s.persona_id = p.id' if 'persona_name' in fields else ''
+        where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        columns = ', '.join(LIST_FIELDS[field] for field in fields)
+        rows = self.db.query(f'''
+            SELECT {columns}, s.created_at, s.id
+            FROM simulations s {join}
+            {where}
+            ORDER BY s.created_at DESC, s.id DESC
+            LIMIT ?
+        ''', params + [limit + 1])
+        
+        next_cursor = encode_list_cursor(*rows[limit - 1][-2:]) if len(rows) > limit else None
         simulations = []
-        for row in rows:
-            simulations.append({
-                'id': row[0],
-                'url': row[1],
-                'persona_id': row[2],
-                'goal': row[3],
-                'duration': row[4],
-                'device_type': row[5],
-                'status': row[6],
-                'results': json.loads(row[7]) if row[7] else None,
-                'created_at': row[8],
-                'completed_at': row[9],
-                'persona_name': row[10]
-            })
+        for row in rows[:limit]:
+            simulation = dict(zip(fields, row))
+            if 'results' in simulation:
+                simulation['results'] = self._load_results(row[-1], simulation['results'])
+            if 'success' in simulation and simulation['success'] is not None:
+                simulation['success'] = bool(simulation['success'])
+            simulations.append(simulation)
+        return simulations, next_cursor
+    
+    @timed_db_operation
+    def count_simulations(self, status=None, persona_id=None, url=None, since=None, until=None):
+        """Number of simulations matching the listing filters"""
+        clauses, params = self._list_filter(status, persona_id, url, since, until)
+        where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return self.db.query_one(f'SELECT COUNT(*) FROM simulations s {where}', params)[0]
+    
+    def _list_filter(self, status, persona_id, url, since, until):
+        filters = [('s.status = ?', status), ('s.persona_id = ?', persona_id), ('s.url = ?', url),
+                   ('s.created_at >= ?', since), ('s.created_at < ?', until)]
+        return ([clause for clause, value in filters if value is not None],
+                [value for _, value in filters if value is not None])
+    
+    @timed_db_operation
+    def get_recent_spans(self, limit=100):
+        """Get the timing span trees of the most recent completed simulations"""
+        rows = self.db.query('''
+            SELECT results FROM simulations
+            WHERE status = 'completed' AND results IS NOT NULL
+            ORDER BY completed_at DESC
+            LIMIT ?
+        ''', (limit,))
         
-        return simulations
\ No newline at end of file
+        return [json.loads(row[0]).get('spans', []) for row in rows]
+
+
+def encode_list_cursor(created_at, simulation_id):
+    """Opaque cursor for the page after the row with this (created_at, id)"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, simulation_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_list_cursor(cursor):
+    try:
+        created_at, simulation_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return created_at, simulation_id
+
+
+def _without_normalized(results):
+    """Results document minus the parts stored in the normalized tables"""
+    document = {key: value for key, value in results.items() if key not in NORMALIZED_RESULT_KEYS}
+    if 'analytics' in document:
+        document['analytics'] = {key: value for key, value in document['analytics'].items()
+                                 if key not in NORMALIZED_ANALYTICS_KEYS.values()}
+    return document
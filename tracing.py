@@ -0,0 +1,97 @@
+import functools
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Records nested timing spans for one simulation run.
+
+    Each span notes its wall duration, the driver round-trips issued inside it and the time
+    spent waiting on them, and deliberate persona sleep time, so engine work, driver latency
+    and think time can be told apart.
+    """
+
+    def __init__(self):
+        self.roots = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        self.counters = lambda: (0, 0.0)  # Replaced with the driver's (round_trips, round_trip_time)
+
+    @contextmanager
+    def span(self, name):
+        round_trips, round_trip_time = self.counters()
+        started = time.perf_counter()
+        node = {
+            'name': name,
+            'start': round(started - self._origin, 6),
+            'duration': 0.0,
+            'round_trips': 0,
+            'round_trip_time': 0.0,
+            'sleep_time': 0.0,
+            'children': []
+        }
+        (self._stack[-1]['children'] if self._stack else self.roots).append(node)
+        self._stack.append(node)
+
+        try:
+            yield node
+        finally:
+            end_round_trips, end_round_trip_time = self.counters()
+            node['duration'] = round(time.perf_counter() - started, 6)
+            node['round_trips'] = end_round_trips - round_trips
+            node['round_trip_time'] = round(end_round_trip_time - round_trip_time, 6)
+            node['sleep_time'] = round(node['sleep_time'], 6)
+            self._stack.pop()
+
+    def add_sleep(self, seconds):
+        """Attribute deliberate persona sleep to every open span"""
+        for node in self._stack:
+            node['sleep_time'] += seconds
+
+    def to_list(self):
+        return self.roots
+
+
+def traced(name):
+    """Record a method call as a span on the tracer kept in the instance's per-run `_local` state"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self._local, 'tracer', None)
+            if tracer is None:
+                return method(self, *args, **kwargs)
+            with tracer.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def aggregate_spans(span_trees, top=10):
+    """Top phases by total time across many simulations' span trees"""
+    phases = {}
+
+    def visit(node):
+        child_time = sum(child['duration'] for child in node['children'])
+        phase = phases.setdefault(node['name'], {
+            'name': node['name'], 'count': 0, 'total_time': 0.0, 'self_time': 0.0,
+            'round_trips': 0, 'round_trip_time': 0.0, 'sleep_time': 0.0
+        })
+        phase['count'] += 1
+        phase['total_time'] += node['duration']
+        phase['self_time'] += max(0.0, node['duration'] - child_time)
+        phase['round_trips'] += node['round_trips']
+        phase['round_trip_time'] += node['round_trip_time']
+        phase['sleep_time'] += node['sleep_time']
+        for child in node['children']:
+            visit(child)
+
+    for tree in span_trees:
+        for root in tree:
+            visit(root)
+
+    ranked = sorted(phases.values(), key=lambda p: p['total_time'], reverse=True)[:top]
+    for phase in ranked:
+        phase['avg_time'] = phase['total_time'] / phase['count']
+        for key in ('total_time', 'self_time', 'round_trip_time', 'sleep_time', 'avg_time'):
+            phase[key] = round(phase[key], 4)
+    return ranked
@@ -0,0 +1,194 @@
+"""Standalone simulation worker.
+
+Pulls jobs from the durable simulation queue and runs them with BehaviorSimulator.
+Start any number of these against the same database. The database is SQLite in WAL mode,
+so every worker must run on the same host as the database file (not over a network
+filesystem); see SQLITE_JOURNAL_MODE in the README for shared storage:
+
+    python worker.py --db simulator.db --threads 2 --processes 4
+
+`--simulator module:factory` swaps in another simulator (anything with run_simulation), e.g.
+the stub used by benchmarks/check_workers.py.
+"""
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+from analytics import AnalyticsEngine
+from behavior_engine import BehaviorSimulator
+from action_log import close_results
+from executor import persist_outcome
+from job_queue import SimulationQueue
+from metrics import REGISTRY, start_metrics_server
+from persona import PersonaManager
+from simulation import SimulationManager
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationWorker:
+    """Leases queued simulations, keeps the lease alive while running, and records the outcome"""
+
+    def __init__(self, queue, simulation_manager, behavior_simulator, worker_id=None, poll_interval=1.0,
+                 analytics_engine=None):
+        self.queue = queue
+        self.simulation_manager = simulation_manager
+        self.behavior_simulator = behavior_simulator
+        self.analytics_engine = analytics_engine
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+
+    def run_forever(self):
+        """Process jobs until stop() is called"""
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                # e.g. a locked database; an unfinished lease simply expires and is re-delivered
+                logger.exception('Worker %s failed to process a job', self.worker_id)
+            self._stopping.wait(self.poll_interval)
+
+    def stop(self):
+        self._stopping.set()
+
+    def run_once(self):
+        """Lease and run a single job; returns False when the queue was empty"""
+        for simulation_id in self.queue.reap_dead_jobs():
+            self.simulation_manager.mark_simulation_failed(simulation_id, 'Worker lease expired too many times')
+
+        job = self.queue.lease(self.worker_id)
+        if not job:
+            return False
+
+        simulation_id = job['simulation_id']
+        lease_lost = threading.Event()
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(simulation_id, done, lease_lost), daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            self.simulation_manager.update_simulation_status(simulation_id, 'running')
+            try:
+                results = self.behavior_simulator.run_simulation(simulation_id, job['config'])
+                error = results.get('error')
+            except Exception as e:
+                results, error = None, str(e)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        # Another worker has taken over the job; its outcome wins
+        if lease_lost.is_set():
+            if results:
+                close_results(results)
+            return True
+
+        # Store the outcome before finishing the job: a crash in between re-delivers the job, and
+        # storing it again is harmless, whereas a finished job is never retried
+        persist_outcome(self.simulation_manager, self.analytics_engine, simulation_id, results, error)
+        self.queue.complete(simulation_id, self.worker_id, error)
+        return True
+
+    def _heartbeat(self, simulation_id, done, lease_lost):
+        interval = self.queue.lease_seconds / 3
+        while not done.wait(interval):
+            if not self.queue.heartbeat(simulation_id, self.worker_id):
+                lease_lost.set()
+                return
+
+
+def load_simulator(spec, db_path):
+    """Build the simulator named by 'module:factory', or BehaviorSimulator when spec is empty"""
+    factory = BehaviorSimulator
+    if spec:
+        module_name, _, attribute = spec.partition(':')
+        factory = getattr(importlib.import_module(module_name), attribute)
+    return factory(persona_manager=PersonaManager(db_path))
+
+
+def export_metrics(port, behavior_simulator):
+    """Serve this process's simulation, browser and SQLite metrics at :port/metrics"""
+    browser_pool = getattr(behavior_simulator, 'browser_pool', None)
+    if browser_pool is not None:
+        REGISTRY.gauge('simulator_active_browsers', 'Pooled browser sessions in use, by device profile').set_function(
+            lambda: {(('device_type', device),): stats['in_use'] for device, stats in browser_pool.stats().items()}
+        )
+        REGISTRY.gauge('simulator_live_browsers', 'Launched browser sessions, by device profile').set_function(
+            lambda: {(('device_type', device),): stats['live'] for device, stats in browser_pool.stats().items()}
+        )
+    start_metrics_server(port)
+    logger.info('Serving worker metrics on port %d', port)
+
+
+def run_worker(db_path, threads, lease_seconds, max_attempts, simulator=None, metrics_port=None):
+    """Run a worker process with one or more job threads"""
+    queue = SimulationQueue(db_path, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    queue.init_db()
+    simulation_manager = SimulationManager(db_path)
+    behavior_simulator = load_simulator(simulator, db_path)
+    if metrics_port:
+        export_metrics(metrics_port, behavior_simulator)
+    analytics_engine = AnalyticsEngine(db_path)
+    analytics_engine.init_db()
+
+    workers = [SimulationWorker(queue, simulation_manager, behavior_simulator, analytics_engine=analytics_engine)
+               for _ in range(threads)]
+    pool = [threading.Thread(target=w.run_forever, daemon=True) for w in workers]
+    for thread in pool:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in pool):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.stop()
+        for thread in pool:
+            thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run simulation queue workers')
+    parser.add_argument('--db', default='simulator.db', help='Path to the shared SQLite database')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent simulations per process')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes to start')
+    parser.add_argument('--lease-seconds', type=int, default=60, help='Lease length before a job is re-delivered')
+    parser.add_argument('--max-attempts', type=int, default=3, help='Deliveries before a job is given up')
+    parser.add_argument('--simulator', help='Simulator factory as module:attribute (default BehaviorSimulator)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics at this port; process N of --processes uses port + N')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(name)s: %(message)s')
+
+    worker_args = (args.db, args.threads, args.lease_seconds, args.max_attempts, args.simulator)
+    if args.processes == 1:
+        run_worker(*worker_args, metrics_port=args.metrics_port)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=worker_args,
+                                kwargs={'metrics_port': args.metrics_port and args.metrics_port + index})
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()